@@ -0,0 +1,66 @@
+import re
+import time
+from contextvars import ContextVar
+
+from rest_framework.serializers import ListSerializer, Serializer
+
+request_stats = ContextVar('request_stats', default=None)
+
+LITERALS = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+PLACEHOLDER_LISTS = re.compile(r'\((?:\s*(?:%s|\?)\s*,)+\s*(?:%s|\?)\s*\)')
+WHITESPACE = re.compile(r'\s+')
+
+
+def normalize_sql(sql):
+    sql = LITERALS.sub('?', sql)
+    sql = PLACEHOLDER_LISTS.sub('(...)', sql)
+    return WHITESPACE.sub(' ', sql).strip()
+
+
+class RequestStats:
+    def __init__(self):
+        self.queries = 0
+        self.sql_time = 0.0
+        self.statements = []
+        self.serializer_time = 0.0
+        self.serializer_depth = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            duration = time.perf_counter() - started
+            self.queries += 1
+            self.sql_time += duration
+            self.statements.append((duration, sql))
+
+    def slowest(self, count):
+        return [
+            {'ms': round(duration * 1000, 2), 'sql': normalize_sql(sql)}
+            for duration, sql in sorted(self.statements, reverse=True)[:count]
+        ]
+
+
+def timed_data(prop):
+    def data(self):
+        stats = request_stats.get()
+        if stats is None:
+            return prop.fget(self)
+        stats.serializer_depth += 1
+        started = time.perf_counter()
+        try:
+            return prop.fget(self)
+        finally:
+            stats.serializer_depth -= 1
+            if not stats.serializer_depth:
+                stats.serializer_time += time.perf_counter() - started
+
+    data.instrumented = True
+    return property(data)
+
+
+def install_serializer_timing():
+    for serializer_class in (Serializer, ListSerializer):
+        if not getattr(serializer_class.data.fget, 'instrumented', False):
+            serializer_class.data = timed_data(serializer_class.data)
@@ -0,0 +1,75 @@
+import os
+from contextlib import contextmanager
+
+from prometheus_client import (CONTENT_TYPE_LATEST, REGISTRY,
+                               CollectorRegistry, Counter, Histogram,
+                               generate_latest, multiprocess)
+
+
+class Metrics:
+    def __init__(self, registry=REGISTRY):
+        self.registry = registry
+        self.request_latency = Histogram(
+            'foodgram_request_latency_seconds',
+            'API request latency',
+            ['view', 'method', 'status'],
+            registry=registry,
+        )
+        self.request_queries = Histogram(
+            'foodgram_request_db_queries',
+            'Database queries per API request',
+            ['view'],
+            buckets=(1, 2, 3, 5, 10, 20, 50, 100, 200, float('inf')),
+            registry=registry,
+        )
+        self.cache_requests = Counter(
+            'foodgram_cache_requests_total',
+            'Application cache lookups',
+            ['cache', 'result'],
+            registry=registry,
+        )
+        self.image_upload_bytes = Histogram(
+            'foodgram_image_upload_bytes',
+            'Size of uploaded recipe images',
+            ['source'],
+            buckets=(2 ** 16, 2 ** 18, 2 ** 20, 2 ** 21, 2 ** 22, 2 ** 23,
+                     2 ** 24, float('inf')),
+            registry=registry,
+        )
+
+
+_metrics = Metrics()
+
+
+def get_metrics():
+    return _metrics
+
+
+@contextmanager
+def use_metrics(metrics):
+    global _metrics
+    previous, _metrics = _metrics, metrics
+    try:
+        yield metrics
+    finally:
+        _metrics = previous
+
+
+def get_registry():
+    if os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return registry
+    return get_metrics().registry
+
+
+def record_cache_lookup(cache, hit):
+    get_metrics().cache_requests.labels(cache, 'hit' if hit else 'miss').inc()
+
+
+def record_image_upload(source, size):
+    get_metrics().image_upload_bytes.labels(source).observe(size)
+
+
+def render_metrics(registry=None):
+    return generate_latest(registry or get_registry()), CONTENT_TYPE_LATEST
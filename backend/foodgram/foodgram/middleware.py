@@ -0,0 +1,127 @@
+import json
+import logging
+import random
+import time
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import connections
+
+from .instrumentation import (RequestStats, install_serializer_timing,
+                              request_stats)
+from .metrics import get_metrics
+
+logger = logging.getLogger('foodgram.requests')
+
+
+class QueryInstrumentationMiddleware:
+    n_plus_one_slope = 1
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.page_observations = {}
+        install_serializer_timing()
+
+    def __call__(self, request):
+        if random.random() >= settings.REQUEST_METRICS_SAMPLE_RATE:
+            return self.get_response(request)
+        stats = RequestStats()
+        request.stats = stats
+        token = request_stats.set(stats)
+        started = time.perf_counter()
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(connection.execute_wrapper(stats))
+                response = self.get_response(request)
+        finally:
+            request_stats.reset(token)
+        total_time = time.perf_counter() - started
+        response['Server-Timing'] = ', '.join((
+            f'db;dur={stats.sql_time * 1000:.1f};desc="{stats.queries} q"',
+            f'serializer;dur={stats.serializer_time * 1000:.1f}',
+            f'total;dur={total_time * 1000:.1f}',
+        ))
+        self.log(request, response, stats, total_time)
+        return response
+
+    def get_view_name(self, request):
+        match = getattr(request, 'resolver_match', None)
+        return match.view_name if match else None
+
+    def get_page_size(self, response):
+        data = getattr(response, 'data', None)
+        if isinstance(data, dict):
+            data = data.get('results')
+        return len(data) if isinstance(data, list) else None
+
+    def grows_with_page_size(self, view_name, page_size, queries):
+        if view_name is None or not page_size:
+            return False
+        observed = self.page_observations.setdefault(view_name, {})
+        others = {
+            size: count for size, count in observed.items()
+            if size != page_size
+        }
+        observed[page_size] = queries
+        for size in sorted(observed)[1:-1]:
+            del observed[size]
+        if not others:
+            return False
+        other = max(others, key=lambda size: abs(size - page_size))
+        slope = (queries - others[other]) / (page_size - other)
+        return slope >= self.n_plus_one_slope
+
+    def log(self, request, response, stats, total_time):
+        view_name = self.get_view_name(request)
+        page_size = self.get_page_size(response)
+        record = {
+            'method': request.method,
+            'path': request.path,
+            'view': view_name,
+            'status': response.status_code,
+            'total_ms': round(total_time * 1000, 2),
+            'db_ms': round(stats.sql_time * 1000, 2),
+            'serializer_ms': round(stats.serializer_time * 1000, 2),
+            'queries': stats.queries,
+            'page_size': page_size,
+            'slowest': stats.slowest(settings.REQUEST_METRICS_SLOWEST),
+        }
+        level = logging.INFO
+        if (total_time * 1000 > settings.REQUEST_METRICS_SLOW_MS
+                or stats.queries > settings.REQUEST_METRICS_MAX_QUERIES):
+            level = logging.WARNING
+        if self.grows_with_page_size(view_name, page_size, stats.queries):
+            record['n_plus_one'] = True
+            level = logging.WARNING
+        logger.log(level, json.dumps(record, ensure_ascii=False))
+
+
+class MetricsMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        started = time.perf_counter()
+        response = self.get_response(request)
+        view = getattr(request, 'metrics_view', None)
+        if view is None:
+            return response
+        metrics = get_metrics()
+        metrics.request_latency.labels(
+            view, request.method, response.status_code
+        ).observe(time.perf_counter() - started)
+        stats = getattr(request, 'stats', None)
+        if stats is not None:
+            metrics.request_queries.labels(view).observe(stats.queries)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        view_class = getattr(view_func, 'cls', None)
+        if view_class is None:
+            request.metrics_view = view_func.__name__
+            return None
+        actions = getattr(view_func, 'actions', None) or {}
+        action = actions.get(request.method.lower(), request.method.lower())
+        request.metrics_view = f'{view_class.__name__}.{action}'
+        return None
@@ -12,7 +12,7 @@ SECRET_KEY = os.getenv(
     default='du-r8n(02px@a9yp3odssrtm-5jtu-(^=2$)v2yym97-&kj20l',
 )
 
-DEBUG = True
+DEBUG = os.getenv('DEBUG', 'False').lower() == 'true'
 
 ALLOWED_HOSTS = ['*']
 
@@ -32,6 +32,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'foodgram.middleware.MetricsMiddleware',
+    'foodgram.middleware.QueryInstrumentationMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -73,6 +75,25 @@ DATABASES = {
     }
 }
 
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    }
+}
+
+if os.getenv('REDIS_URL'):
+    CACHES['default'] = {
+        'BACKEND': 'django_redis.cache.RedisCache',
+        'LOCATION': os.getenv('REDIS_URL'),
+    }
+
+REFERENCE_CACHE_TIMEOUT = int(os.getenv('REFERENCE_CACHE_TIMEOUT', 60 * 60))
+REFERENCE_CACHE_MAX_AGE = int(os.getenv('REFERENCE_CACHE_MAX_AGE', 60))
+ANONYMOUS_CACHE_TIMEOUT = int(os.getenv('ANONYMOUS_CACHE_TIMEOUT', 5 * 60))
+RECIPE_FRAGMENT_CACHE_TIMEOUT = int(
+    os.getenv('RECIPE_FRAGMENT_CACHE_TIMEOUT', 60 * 60)
+)
+
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
         'rest_framework.authentication.TokenAuthentication',
@@ -132,3 +153,47 @@ STATIC_ROOT = os.path.join(BASE_DIR, 'static')
 
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
+
+SHOPPING_LIST_PDF_FONT = os.getenv(
+    'SHOPPING_LIST_PDF_FONT',
+    '/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf',
+)
+
+INGREDIENT_SEARCH_LIMIT = int(os.getenv('INGREDIENT_SEARCH_LIMIT', 100))
+INGREDIENT_INDEX_TIMEOUT = int(os.getenv('INGREDIENT_INDEX_TIMEOUT', 300))
+
+FEED_MAX_LENGTH = int(os.getenv('FEED_MAX_LENGTH', 500))
+FEED_BATCH_SIZE = int(os.getenv('FEED_BATCH_SIZE', 1000))
+
+RECIPE_IMAGE_MAX_SIZE = int(os.getenv('RECIPE_IMAGE_MAX_SIZE', 10 * 2 ** 20))
+RECIPE_IMAGE_WORKERS = int(os.getenv('RECIPE_IMAGE_WORKERS', 2))
+RECIPE_IMAGE_VARIANTS = {
+    'thumbnail': (480, 480),
+}
+RECIPE_LIST_IMAGE = ('thumbnail', 'webp')
+RECIPE_FAST_READS = os.getenv('RECIPE_FAST_READS', 'True').lower() == 'true'
+
+REQUEST_METRICS_SAMPLE_RATE = float(
+    os.getenv('REQUEST_METRICS_SAMPLE_RATE', 1.0)
+)
+REQUEST_METRICS_SLOWEST = int(os.getenv('REQUEST_METRICS_SLOWEST', 3))
+REQUEST_METRICS_SLOW_MS = int(os.getenv('REQUEST_METRICS_SLOW_MS', 500))
+REQUEST_METRICS_MAX_QUERIES = int(
+    os.getenv('REQUEST_METRICS_MAX_QUERIES', 20)
+)
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {
+            'class': 'logging.StreamHandler',
+        },
+    },
+    'loggers': {
+        'foodgram.requests': {
+            'handlers': ['console'],
+            'level': os.getenv('REQUEST_METRICS_LOG_LEVEL', 'INFO'),
+        },
+    },
+}
@@ -0,0 +1,31 @@
+from django.core.cache import cache
+from django.test import TestCase
+from prometheus_client import CollectorRegistry
+
+from .metrics import Metrics, use_metrics
+
+
+class MetricsTests(TestCase):
+    def test_request_is_recorded_in_local_registry(self):
+        cache.clear()
+        registry = CollectorRegistry()
+        with use_metrics(Metrics(registry)):
+            response = self.client.get('/api/tags/')
+            metrics = self.client.get('/api/metrics')
+        self.assertEqual(response.status_code, 200)
+        labels = {'view': 'TagViewSet.list', 'method': 'GET', 'status': '200'}
+        self.assertEqual(registry.get_sample_value(
+            'foodgram_request_latency_seconds_count', labels
+        ), 1)
+        self.assertEqual(registry.get_sample_value(
+            'foodgram_request_db_queries_count', {'view': 'TagViewSet.list'}
+        ), 1)
+        self.assertEqual(registry.get_sample_value(
+            'foodgram_cache_requests_total',
+            {'cache': 'reference', 'result': 'miss'},
+        ), 1)
+        self.assertIn(
+            b'foodgram_request_latency_seconds_count{method="GET",'
+            b'status="200",view="TagViewSet.list"} 1.0',
+            metrics.content,
+        )
@@ -1,8 +1,11 @@
 from django.contrib import admin
 from django.urls import include, path
 
+from .views import metrics
+
 urlpatterns = [
     path('admin/', admin.site.urls),
+    path('api/metrics', metrics, name='metrics'),
     path('api/', include('recipes.urls', namespace='recipes')),
     path('api/', include('users.urls', namespace='users'))
 ]
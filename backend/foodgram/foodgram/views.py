@@ -0,0 +1,10 @@
+from django.http import HttpResponse
+from django.views.decorators.http import require_GET
+
+from .metrics import render_metrics
+
+
+@require_GET
+def metrics(request):
+    content, content_type = render_metrics()
+    return HttpResponse(content, content_type=content_type)
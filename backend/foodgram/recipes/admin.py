@@ -5,7 +5,7 @@ from .models import (FavouriteRecipe, Ingredient, IngredientInRecipe, Recipe,
 
 
 class RecipeAdmin(admin.ModelAdmin):
-    list_display = ('name', 'author',)
+    list_display = ('name', 'author', 'favorites_count', 'cart_count',)
     list_filter = ('name', 'author', 'tags',)
 
 
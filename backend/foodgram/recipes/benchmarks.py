@@ -0,0 +1,117 @@
+import math
+import statistics
+
+from django.db import connection
+
+from users.models import Follow, User
+from .models import (FavouriteRecipe, Ingredient, IngredientInRecipe, Recipe,
+                     ShoppingCartRecipe, Tag)
+
+BENCHMARK_CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'benchmark',
+    }
+}
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(len(ordered) * pct / 100) - 1)]
+
+
+def summarize(timings):
+    return {
+        'p50_ms': round(statistics.median(timings), 2),
+        'p95_ms': round(percentile(timings, 95), 2),
+    }
+
+
+def seed_users(count, prefix='benchmark'):
+    User.objects.bulk_create(
+        User(email=f'{prefix}{index}@foodgram.local',
+             username=f'{prefix}{index}', password='!',
+             first_name='Bench', last_name=str(index))
+        for index in range(count)
+    )
+    return list(User.objects.filter(
+        email__startswith=prefix, email__endswith='@foodgram.local'
+    ).order_by('id').values_list('id', flat=True))
+
+
+def seed_tags(count):
+    Tag.objects.bulk_create(
+        Tag(name=f'benchmark {index}', color=f'#{index:06x}',
+            slug=f'benchmark-{index}')
+        for index in range(count)
+    )
+    return list(Tag.objects.filter(
+        slug__startswith='benchmark-'
+    ).values_list('id', flat=True))
+
+
+def seed_ingredients(count):
+    Ingredient.objects.bulk_create(
+        (Ingredient(name=f'ингредиент {index}', measurement_unit='г')
+         for index in range(count)),
+        ignore_conflicts=True,
+    )
+    return list(Ingredient.objects.values_list('id', flat=True))
+
+
+def seed_recipes(count, author_ids, ingredient_ids, rng, tag_ids=(),
+                 batch_size=5000):
+    created = 0
+    while created < count:
+        size = min(batch_size, count - created)
+        picks = [rng.sample(ingredient_ids, rng.randint(3, 15))
+                 for _ in range(size)]
+        recipes = [
+            Recipe(author_id=rng.choice(author_ids),
+                   name=f'рецепт {created + index}', text='описание',
+                   image='recipe_images/benchmark.jpg',
+                   cooking_time=rng.randint(5, 120),
+                   ingredients_count=len(pick))
+            for index, pick in enumerate(picks)
+        ]
+        if connection.features.can_return_rows_from_bulk_insert:
+            Recipe.objects.bulk_create(recipes)
+        else:
+            for recipe in recipes:
+                recipe.save()
+        IngredientInRecipe.objects.bulk_create(
+            (IngredientInRecipe(recipe=recipe, ingredient_id=ingredient_id,
+                                amount=rng.randint(1, 500))
+             for recipe, pick in zip(recipes, picks)
+             for ingredient_id in pick),
+            batch_size=batch_size,
+        )
+        if tag_ids:
+            Recipe.tags.through.objects.bulk_create(
+                (Recipe.tags.through(recipe_id=recipe.id, tag_id=tag_id)
+                 for recipe in recipes
+                 for tag_id in rng.sample(tag_ids, min(2, len(tag_ids)))),
+                batch_size=batch_size,
+            )
+        created += size
+
+
+def seed_relations(user_ids, recipe_ids, rng, follows=20, favorites=20,
+                   cart=10):
+    Follow.objects.bulk_create(
+        (Follow(user_id=user_id, following_id=author_id)
+         for user_id in user_ids
+         for author_id in rng.sample(user_ids, min(follows, len(user_ids)))
+         if author_id != user_id),
+        batch_size=5000, ignore_conflicts=True,
+    )
+    for model, per_user in ((FavouriteRecipe, favorites),
+                            (ShoppingCartRecipe, cart)):
+        model.objects.bulk_create(
+            (model(user_id=user_id, recipe_id=recipe_id)
+             for user_id in user_ids
+             for recipe_id in rng.sample(
+                 recipe_ids, min(per_user, len(recipe_ids))
+             )),
+            batch_size=5000, ignore_conflicts=True,
+        )
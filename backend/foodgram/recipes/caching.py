@@ -0,0 +1,180 @@
+import hashlib
+import json
+import uuid
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.utils.cache import get_conditional_response
+from django.http import HttpResponse
+from django.utils.http import quote_etag
+from rest_framework.response import Response
+
+from foodgram.metrics import record_cache_lookup
+
+
+def get_cache_version(model):
+    return cache.get_or_set(f'{model._meta.label_lower}:version', 1, None)
+
+
+def bump_cache_version(model):
+    key = f'{model._meta.label_lower}:version'
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, 2, None)
+
+
+WRITE_GENERATION = 'dependencies:generation'
+
+
+def new_token():
+    return uuid.uuid4().hex
+
+
+def get_dependency_tokens(keys):
+    tokens = cache.get_many(keys)
+    for key in set(keys) - tokens.keys():
+        token = new_token()
+        cache.add(key, token, None)
+        tokens[key] = cache.get(key, token)
+    return tokens
+
+
+def bump_dependencies(keys):
+    transaction.on_commit(lambda: cache.set_many(
+        {key: new_token() for key in [*keys, WRITE_GENERATION]}, None
+    ))
+
+
+def is_write_generation(tokens):
+    return cache.get(WRITE_GENERATION) == tokens[WRITE_GENERATION]
+
+
+def make_etag(data):
+    return quote_etag(hashlib.md5(json.dumps(
+        data, sort_keys=True, ensure_ascii=False, default=str
+    ).encode()).hexdigest())
+
+
+class CachedReferenceMixin:
+    def get_cache_key(self, request):
+        model = self.get_queryset().model
+        return (f'{model._meta.label_lower}:{get_cache_version(model)}:'
+                f'{self.action}:{request.get_full_path()}')
+
+    def cached_response(self, request, view, *args, **kwargs):
+        key = self.get_cache_key(request)
+        cached = cache.get(key)
+        record_cache_lookup('reference', cached is not None)
+        if cached is None:
+            response = view(request, *args, **kwargs)
+            if response.status_code != 200:
+                return response
+            cached = (response.data, make_etag(response.data))
+            cache.set(key, cached, settings.REFERENCE_CACHE_TIMEOUT)
+        data, etag = cached
+        response = get_conditional_response(request, etag=etag)
+        if response is None:
+            response = Response(data)
+        response['ETag'] = etag
+        response['Cache-Control'] = (
+            f'public, max-age={settings.REFERENCE_CACHE_MAX_AGE}'
+        )
+        return response
+
+    def list(self, request, *args, **kwargs):
+        return self.cached_response(request, super().list, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.cached_response(
+            request, super().retrieve, *args, **kwargs
+        )
+
+
+class AnonymousResponseCacheMixin:
+    anonymous_cache_actions = ('list', 'retrieve')
+    anonymous_cache_params = ('tags', 'author', 'page', 'limit')
+
+    def get_anonymous_cache_key(self, request):
+        params = request.query_params
+        if (request.user.is_authenticated
+                or request.method != 'GET'
+                or self.action not in self.anonymous_cache_actions
+                or set(params) - set(self.anonymous_cache_params)):
+            return None
+        query = urlencode(sorted(
+            (key, value) for key in params for value in params.getlist(key)
+        ))
+        return (f'anonymous:{request.accepted_renderer.format}:'
+                f'{request.scheme}://{request.get_host()}'
+                f'{request.path}?{query}')
+
+    def get_membership_dependencies(self, request):
+        if self.action != 'list':
+            return []
+        params = request.query_params
+        dependencies = [
+            f'recipes:list:tag:{slug}' for slug in params.getlist('tags')
+        ]
+        if dependencies:
+            dependencies.append('tags')
+        if params.get('author'):
+            dependencies.append(f'recipes:list:author:{params["author"]}')
+        return dependencies or ['recipes:list']
+
+    def get_content_dependencies(self, data):
+        recipes = data.get('results', []) if self.action == 'list' else [data]
+        dependencies = {'ingredients'}
+        for recipe in recipes:
+            dependencies.add(f'recipe:{recipe["id"]}')
+            dependencies.add(f'user:{recipe["author"]["id"]}')
+            dependencies.update(f'tag:{tag["id"]}' for tag in recipe['tags'])
+        return dependencies
+
+    def get_cached_response(self, request):
+        self.anonymous_cache_key = self.get_anonymous_cache_key(request)
+        if self.anonymous_cache_key is None:
+            return None
+        cached = cache.get(self.anonymous_cache_key)
+        hit = cached is not None and (
+            get_dependency_tokens(list(cached['dependencies']))
+            == cached['dependencies']
+        )
+        record_cache_lookup('anonymous', hit)
+        if not hit:
+            self.anonymous_cache_tokens = get_dependency_tokens(
+                [WRITE_GENERATION]
+                + self.get_membership_dependencies(request)
+            )
+            return None
+        self.anonymous_cache_key = None
+        return HttpResponse(
+            cached['content'], content_type=cached['content_type']
+        )
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(
+            request, response, *args, **kwargs
+        )
+        key = getattr(self, 'anonymous_cache_key', None)
+        if (key is None or response.status_code != 200
+                or not isinstance(response, Response)):
+            return response
+        tokens = dict(self.anonymous_cache_tokens)
+        tokens.update(get_dependency_tokens([
+            dependency
+            for dependency in self.get_content_dependencies(response.data)
+            if dependency not in tokens
+        ]))
+        response.render()
+        if not is_write_generation(tokens):
+            return response
+        del tokens[WRITE_GENERATION]
+        cache.set(key, {
+            'dependencies': tokens,
+            'content': response.content,
+            'content_type': response['Content-Type'],
+        }, settings.ANONYMOUS_CACHE_TIMEOUT)
+        return response
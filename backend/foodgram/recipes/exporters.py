@@ -0,0 +1,98 @@
+import csv
+import io
+import os
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+
+from rest_framework.negotiation import DefaultContentNegotiation
+
+
+class ExportContentNegotiation(DefaultContentNegotiation):
+    def select_renderer(self, request, renderers, format_suffix=None):
+        return renderers[0], renderers[0].media_type
+
+
+class Echo:
+    def write(self, value):
+        return value
+
+
+class TextExporter:
+    content_type = 'text/plain; charset=utf-8'
+    extension = 'txt'
+
+    def render(self, rows):
+        for row in rows:
+            yield (f'{row["name"]} - {row["total_amount"]} '
+                   f'{row["measurement_unit"]} \n')
+
+
+class CsvExporter:
+    content_type = 'text/csv; charset=utf-8'
+    extension = 'csv'
+
+    def render(self, rows):
+        writer = csv.writer(Echo())
+        yield writer.writerow(('name', 'amount', 'measurement_unit'))
+        for row in rows:
+            yield writer.writerow(
+                (row['name'], row['total_amount'], row['measurement_unit'])
+            )
+
+
+class PdfExporter:
+    # reportlab writes the whole document at save(), so unlike the text
+    # exporters the PDF is built in memory and only then sent in chunks.
+    content_type = 'application/pdf'
+    extension = 'pdf'
+    font_name = 'ShoppingListFont'
+    chunk_size = 8192
+
+    def __init__(self):
+        self.font = self.get_font()
+
+    def get_font(self):
+        from reportlab.pdfbase import pdfmetrics
+        from reportlab.pdfbase.ttfonts import TTFont
+
+        font_path = settings.SHOPPING_LIST_PDF_FONT
+        if not font_path or not os.path.isfile(font_path):
+            raise ImproperlyConfigured(
+                'SHOPPING_LIST_PDF_FONT must point to a TrueType font with '
+                f'Cyrillic glyphs, got {font_path!r}'
+            )
+        if self.font_name not in pdfmetrics.getRegisteredFontNames():
+            pdfmetrics.registerFont(TTFont(self.font_name, font_path))
+        return self.font_name
+
+    def render(self, rows):
+        from reportlab.lib.pagesizes import A4
+        from reportlab.pdfgen import canvas
+
+        buffer = io.BytesIO()
+        pdf = canvas.Canvas(buffer, pagesize=A4)
+        font = self.font
+        width, height = A4
+        y = height - 50
+        pdf.setFont(font, 12)
+        for row in rows:
+            if y < 50:
+                pdf.showPage()
+                pdf.setFont(font, 12)
+                y = height - 50
+            pdf.drawString(
+                50, y, f'{row["name"]} - {row["total_amount"]} '
+                       f'{row["measurement_unit"]}'
+            )
+            y -= 20
+        pdf.save()
+        buffer.seek(0)
+        yield from iter(lambda: buffer.read(self.chunk_size), b'')
+
+
+EXPORTERS = {
+    'txt': TextExporter,
+    'csv': CsvExporter,
+    'pdf': PdfExporter,
+}
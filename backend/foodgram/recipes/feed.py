@@ -0,0 +1,94 @@
+import operator
+from collections import defaultdict
+from functools import reduce
+from itertools import islice
+
+from django.conf import settings
+from django.db.models import Count, Min, Q
+
+from users.models import Follow
+from .models import FeedRecipe, Recipe
+
+
+def fan_out_recipe(recipe):
+    fan_out_recipes([recipe])
+
+
+def fan_out_recipes(recipes):
+    recipe_ids = defaultdict(list)
+    for recipe in recipes:
+        recipe_ids[recipe.author_id].append(recipe.id)
+    follows = Follow.objects.filter(
+        following__in=recipe_ids
+    ).values_list('user_id', 'following_id').iterator()
+    while True:
+        chunk = list(islice(follows, settings.FEED_BATCH_SIZE))
+        if not chunk:
+            break
+        FeedRecipe.objects.bulk_create(
+            [FeedRecipe(user_id=user_id, recipe_id=recipe_id)
+             for user_id, author_id in chunk
+             for recipe_id in recipe_ids[author_id]],
+            batch_size=settings.FEED_BATCH_SIZE,
+            ignore_conflicts=True,
+        )
+        trim_feeds({user_id for user_id, _ in chunk})
+
+
+def follow_author(follow):
+    recipes = Recipe.objects.filter(
+        author=follow.following_id
+    ).order_by('-id').values_list('id', flat=True)
+    FeedRecipe.objects.bulk_create(
+        [FeedRecipe(user_id=follow.user_id, recipe_id=recipe_id)
+         for recipe_id in recipes[:settings.FEED_MAX_LENGTH]],
+        ignore_conflicts=True,
+    )
+    trim_feed(follow.user_id)
+
+
+def unfollow_author(follow):
+    FeedRecipe.objects.filter(
+        user=follow.user_id, recipe__author=follow.following_id
+    ).delete()
+
+
+def trim_feeds(user_ids):
+    feeds = FeedRecipe.objects.filter(user__in=user_ids).order_by().values(
+        'user'
+    ).annotate(
+        total=Count('id'), oldest=Min('recipe_id')
+    ).filter(total__gt=settings.FEED_MAX_LENGTH)
+    oldest = []
+    for feed in feeds:
+        if feed['total'] == settings.FEED_MAX_LENGTH + 1:
+            oldest.append(Q(user=feed['user'], recipe_id=feed['oldest']))
+        else:
+            trim_feed(feed['user'])
+    if oldest:
+        FeedRecipe.objects.filter(reduce(operator.or_, oldest)).delete()
+
+
+def trim_feed(user_id):
+    boundary = FeedRecipe.objects.filter(
+        user=user_id
+    ).order_by('-recipe_id').values_list(
+        'recipe_id', flat=True
+    )[settings.FEED_MAX_LENGTH - 1:settings.FEED_MAX_LENGTH]
+    boundary = list(boundary)
+    if boundary:
+        FeedRecipe.objects.filter(
+            user=user_id, recipe_id__lt=boundary[0]
+        ).delete()
+
+
+def rebuild_feed(user_id):
+    FeedRecipe.objects.filter(user=user_id).delete()
+    recipes = Recipe.objects.filter(
+        author__following__user=user_id
+    ).order_by('-id').values_list('id', flat=True)
+    FeedRecipe.objects.bulk_create(
+        [FeedRecipe(user_id=user_id, recipe_id=recipe_id)
+         for recipe_id in recipes[:settings.FEED_MAX_LENGTH]],
+        batch_size=settings.FEED_BATCH_SIZE,
+    )
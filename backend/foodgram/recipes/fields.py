@@ -0,0 +1,64 @@
+import binascii
+import uuid
+
+from django.conf import settings
+from django.core.files.uploadedfile import TemporaryUploadedFile
+from drf_extra_fields.fields import Base64ImageField
+from PIL import Image
+from rest_framework import serializers
+from rest_framework.serializers import ValidationError
+
+from foodgram.metrics import record_image_upload
+
+
+class StreamingBase64ImageField(Base64ImageField):
+    chunk_size = 64 * 1024
+
+    def decode_to_file(self, base64_data):
+        content = TemporaryUploadedFile(
+            f'{uuid.uuid4()}.tmp', 'application/octet-stream', 0, None
+        )
+        carry = ''
+        for start in range(0, len(base64_data), self.chunk_size):
+            chunk = carry + ''.join(
+                base64_data[start:start + self.chunk_size].split()
+            )
+            aligned = len(chunk) - len(chunk) % 4
+            content.write(binascii.a2b_base64(chunk[:aligned]))
+            carry = chunk[aligned:]
+        if carry:
+            raise binascii.Error('Incorrect padding')
+        content.size = content.tell()
+        content.seek(0)
+        return content
+
+    def upload_to_internal_value(self, upload):
+        if getattr(upload, 'size', 0) > settings.RECIPE_IMAGE_MAX_SIZE:
+            raise ValidationError('Размер изображения превышает допустимый!')
+        record_image_upload('multipart', upload.size)
+        return serializers.ImageField.to_internal_value(self, upload)
+
+    def to_internal_value(self, base64_data):
+        if base64_data in self.EMPTY_VALUES:
+            return None
+        if not isinstance(base64_data, str):
+            return self.upload_to_internal_value(base64_data)
+        if ';base64,' in base64_data:
+            base64_data = base64_data.split(';base64,', 1)[1]
+        if len(base64_data) * 3 // 4 > settings.RECIPE_IMAGE_MAX_SIZE:
+            raise ValidationError('Размер изображения превышает допустимый!')
+        try:
+            content = self.decode_to_file(base64_data)
+        except (TypeError, binascii.Error, ValueError):
+            raise ValidationError(self.INVALID_FILE_MESSAGE)
+        try:
+            extension = Image.open(content).format.lower()
+        except (OSError, AttributeError):
+            raise ValidationError(self.INVALID_FILE_MESSAGE)
+        extension = 'jpg' if extension == 'jpeg' else extension
+        if extension not in self.ALLOWED_TYPES:
+            raise ValidationError(self.INVALID_TYPE_MESSAGE)
+        content.seek(0)
+        content.name = f'{uuid.uuid4()}.{extension}'
+        record_image_upload('base64', content.size)
+        return serializers.ImageField.to_internal_value(self, content)
@@ -2,6 +2,7 @@ from django_filters.rest_framework import FilterSet, filters
 from rest_framework.filters import SearchFilter
 
 from .models import Recipe, User
+from .search import search_recipes
 
 
 class IngredientNameFilter(SearchFilter):
@@ -14,6 +15,8 @@ class RecipeFilter(FilterSet):
     is_favorited = filters.BooleanFilter(method='filter_is_favorited')
     is_in_shopping_cart = filters.BooleanFilter(
         method='filter_is_in_shopping_cart')
+    ordering = filters.CharFilter(method='filter_ordering')
+    search = filters.CharFilter(method='filter_search')
 
     def filter_is_favorited(self, queryset, name, value):
         if value and not self.request.user.is_anonymous:
@@ -25,6 +28,14 @@ class RecipeFilter(FilterSet):
             return queryset.filter(cart__user=self.request.user)
         return queryset
 
+    def filter_ordering(self, queryset, name, value):
+        if value == 'popular':
+            return queryset.order_by('-favorites_count', '-id')
+        return queryset
+
+    def filter_search(self, queryset, name, value):
+        return search_recipes(queryset, value)
+
     class Meta:
         model = Recipe
         fields = ('tags', 'author')
@@ -0,0 +1,80 @@
+import io
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import close_old_connections, transaction
+from PIL import Image, ImageOps
+
+from .caching import bump_dependencies
+from .models import Recipe
+
+executor = ThreadPoolExecutor(
+    max_workers=settings.RECIPE_IMAGE_WORKERS,
+    thread_name_prefix='recipe-images',
+)
+
+FORMATS = {
+    'webp': ('WEBP', {'quality': 80}),
+    'jpeg': ('JPEG', {'quality': 85, 'optimize': True, 'progressive': True}),
+}
+
+
+def render_variant(image, size, image_format):
+    pil_format, save_options = FORMATS[image_format]
+    variant = ImageOps.fit(image, size, Image.LANCZOS)
+    if variant.mode not in ('RGB', 'L'):
+        variant = variant.convert('RGB')
+    buffer = io.BytesIO()
+    variant.save(buffer, pil_format, **save_options)
+    return buffer.getvalue()
+
+
+def generate_image_variants(recipe_id):
+    recipe = Recipe.objects.only('image').get(pk=recipe_id)
+    storage = recipe.image.storage
+    base_name = os.path.splitext(os.path.basename(recipe.image.name))[0]
+    variants = {}
+    with recipe.image.open('rb') as source:
+        image = Image.open(source)
+        image.draft('RGB', max(settings.RECIPE_IMAGE_VARIANTS.values()))
+        image = ImageOps.exif_transpose(image)
+        for variant, size in settings.RECIPE_IMAGE_VARIANTS.items():
+            variants[variant] = {}
+            for image_format in FORMATS:
+                name = storage.save(
+                    f'recipe_images/{variant}/{base_name}.{image_format}',
+                    ContentFile(render_variant(image, size, image_format)),
+                )
+                variants[variant][image_format] = name
+    Recipe.objects.filter(
+        pk=recipe_id, image=recipe.image.name
+    ).update(image_variants=variants)
+    bump_dependencies([f'recipe:{recipe_id}'])
+    return variants
+
+
+def run_in_worker(recipe_id):
+    close_old_connections()
+    try:
+        generate_image_variants(recipe_id)
+    except Recipe.DoesNotExist:
+        pass
+    finally:
+        close_old_connections()
+
+
+def schedule_image_variants(recipe):
+    transaction.on_commit(lambda: executor.submit(run_in_worker, recipe.pk))
+
+
+def get_image_variant_url(recipe, request=None):
+    variant, image_format = settings.RECIPE_LIST_IMAGE
+    name = recipe.image_variants.get(variant, {}).get(image_format)
+    if not name:
+        return None
+    url = recipe.image.storage.url(name)
+    if request is not None:
+        return request.build_absolute_uri(url)
+    return url
@@ -0,0 +1,35 @@
+from django.contrib.postgres.indexes import GinIndex
+from django.db.models import Index
+
+
+class UpperPatternIndex(Index):
+    """Index UPPER(field) for istartswith on PostgreSQL.
+
+    Other databases get a plain index on the field, so the migration is
+    the same everywhere.
+    """
+
+    def create_sql(self, model, schema_editor, using='', **kwargs):
+        statement = super().create_sql(
+            model, schema_editor, using=using, **kwargs
+        )
+        if schema_editor.connection.vendor == 'postgresql':
+            column = model._meta.get_field(self.fields[0]).column
+            statement.parts['columns'] = (
+                f'UPPER({schema_editor.quote_name(column)}::text) '
+                f'text_pattern_ops'
+            )
+        return statement
+
+
+class SearchVectorIndex(GinIndex):
+    """GIN index on PostgreSQL, plain index on other databases."""
+
+    def create_sql(self, model, schema_editor, using='', **kwargs):
+        if schema_editor.connection.vendor != 'postgresql':
+            return Index.create_sql(
+                self, model, schema_editor, using=using, **kwargs
+            )
+        return super().create_sql(
+            model, schema_editor, using=using, **kwargs
+        )
@@ -0,0 +1,65 @@
+import bisect
+import threading
+import time
+
+from django.conf import settings
+
+from .models import Ingredient
+
+
+class IngredientIndex:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._keys = None
+        self._rows = None
+        self._built_at = 0
+
+    def invalidate(self):
+        with self._lock:
+            self._keys = None
+            self._rows = None
+
+    def _is_stale(self):
+        timeout = getattr(settings, 'INGREDIENT_INDEX_TIMEOUT', 300)
+        return (self._keys is None
+                or time.monotonic() - self._built_at > timeout)
+
+    def _build(self):
+        rows = sorted(
+            (name.lower(), pk, name, measurement_unit)
+            for pk, name, measurement_unit in Ingredient.objects.values_list(
+                'id', 'name', 'measurement_unit'
+            )
+        )
+        self._keys = [row[0] for row in rows]
+        self._rows = [
+            {'id': pk, 'name': name, 'measurement_unit': measurement_unit}
+            for _, pk, name, measurement_unit in rows
+        ]
+        self._built_at = time.monotonic()
+
+    def _get(self):
+        with self._lock:
+            if self._is_stale():
+                self._build()
+            return self._keys, self._rows
+
+    def search(self, query, limit=None):
+        if limit is None:
+            limit = getattr(settings, 'INGREDIENT_SEARCH_LIMIT', 100)
+        keys, rows = self._get()
+        query = query.lower()
+        start = bisect.bisect_left(keys, query)
+        end = bisect.bisect_left(keys, query + '\uffff', start)
+        results = rows[start:min(end, start + limit)]
+        if len(results) < limit:
+            for index, key in enumerate(keys):
+                if (start <= index < end) or query not in key:
+                    continue
+                results.append(rows[index])
+                if len(results) == limit:
+                    break
+        return results
+
+
+ingredient_index = IngredientIndex()
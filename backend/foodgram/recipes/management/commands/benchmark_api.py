@@ -0,0 +1,245 @@
+import base64
+import io
+import json
+import random
+import sys
+import tempfile
+import time
+
+import django
+from django.core.cache import cache
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test import Client, override_settings
+from django.test.utils import CaptureQueriesContext
+from PIL import Image
+from rest_framework.authtoken.models import Token
+
+from recipes.benchmarks import (BENCHMARK_CACHES, seed_ingredients,
+                                seed_recipes, seed_relations, seed_tags,
+                                seed_users, summarize)
+from recipes.feed import rebuild_feed
+from recipes.ingredient_index import ingredient_index
+from recipes.models import Ingredient, Recipe, Tag
+from users.models import User
+
+
+class Command(BaseCommand):
+    help = 'Measure queries, latency and payload size of every API endpoint'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=200)
+        parser.add_argument('--recipes', type=int, default=5000)
+        parser.add_argument('--ingredients', type=int, default=2000)
+        parser.add_argument('--tags', type=int, default=10)
+        parser.add_argument('--runs', type=int, default=20)
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--output', help='Write JSON results to a file')
+        parser.add_argument(
+            '--compare',
+            help='Baseline JSON; fail if any endpoint issues more queries',
+        )
+
+    def get_image(self):
+        buffer = io.BytesIO()
+        Image.new('RGB', (64, 64), (200, 120, 40)).save(buffer, 'PNG')
+        return ('data:image/png;base64,'
+                + base64.b64encode(buffer.getvalue()).decode())
+
+    def get_recipe_payload(self, recipe, tag):
+        return {
+            'name': 'рецепт для замера',
+            'text': 'описание',
+            'cooking_time': 30,
+            'image': self.get_image(),
+            'tags': [tag.id],
+            'ingredients': [
+                {'id': item.ingredient_id, 'amount': item.amount + 1}
+                for item in recipe.ingredients.all()
+            ],
+        }
+
+    def seed(self, options, rng):
+        user_ids = seed_users(options['users'])
+        tag_ids = seed_tags(options['tags'])
+        ingredient_ids = seed_ingredients(options['ingredients'])
+        seed_recipes(options['recipes'], user_ids, ingredient_ids, rng,
+                     tag_ids=tag_ids)
+        seed_recipes(2, user_ids[:1], ingredient_ids, rng, tag_ids=tag_ids)
+        recipe_ids = list(Recipe.objects.values_list('id', flat=True))
+        seed_relations(user_ids, recipe_ids, rng)
+        call_command('reconcile_counters', stdout=io.StringIO())
+        rebuild_feed(user_ids[0])
+        return user_ids
+
+    def get_endpoints(self, user_ids):
+        user_id = user_ids[0]
+        recipe = Recipe.objects.exclude(favorites__user=user_id).exclude(
+            cart__user=user_id
+        ).order_by('-favorites_count').first()
+        tag = Tag.objects.order_by('id').first()
+        ingredient = Ingredient.objects.order_by('id').first()
+        author_id = User.objects.exclude(id=user_id).exclude(
+            following__user=user_id
+        ).values_list('id', flat=True).first()
+        if author_id is None:
+            author_id = seed_users(1, prefix='benchmark-author')[0]
+        own_recipes = list(
+            Recipe.objects.filter(author_id=user_id).order_by('id')[:2]
+        )
+        payload = self.get_recipe_payload(recipe, tag)
+        pantry = '&'.join(
+            f'ingredients={pk}' for pk in recipe.ingredients.values_list(
+                'ingredient_id', flat=True
+            )[:5]
+        )
+        return [
+            ('recipes.create', 'post', '/api/recipes/', True, payload),
+            ('recipes.update', 'put',
+             f'/api/recipes/{own_recipes[0].id}/', True, payload),
+            ('recipes.destroy', 'delete',
+             f'/api/recipes/{own_recipes[1].id}/', True),
+            ('recipes.list', 'get', '/api/recipes/', True),
+            ('recipes.list.anonymous', 'get', '/api/recipes/', False),
+            ('recipes.list.limit30', 'get', '/api/recipes/?limit=30', True),
+            ('recipes.list.tags', 'get',
+             f'/api/recipes/?tags={tag.slug}', True),
+            ('recipes.list.favorited', 'get',
+             '/api/recipes/?is_favorited=1', True),
+            ('recipes.list.cursor', 'get',
+             '/api/recipes/?pagination=cursor&count=false', True),
+            ('recipes.list.search', 'get', '/api/recipes/?search=рецепт',
+             True),
+            ('recipes.retrieve', 'get', f'/api/recipes/{recipe.id}/', True),
+            ('recipes.feed', 'get', '/api/recipes/feed/', True),
+            ('recipes.cook', 'get', f'/api/recipes/cook/?{pantry}', True),
+            ('recipes.download_shopping_cart', 'get',
+             '/api/recipes/download_shopping_cart/', True),
+            ('recipes.download_shopping_cart.csv', 'get',
+             '/api/recipes/download_shopping_cart/?format=csv', True),
+            ('recipes.favorite', 'get',
+             f'/api/recipes/{recipe.id}/favorite/', True),
+            ('recipes.favorite.delete', 'delete',
+             f'/api/recipes/{recipe.id}/favorite/', True),
+            ('recipes.shopping_cart', 'get',
+             f'/api/recipes/{recipe.id}/shopping_cart/', True),
+            ('recipes.shopping_cart.delete', 'delete',
+             f'/api/recipes/{recipe.id}/shopping_cart/', True),
+            ('ingredients.list', 'get', '/api/ingredients/', False),
+            ('ingredients.search', 'get',
+             f'/api/ingredients/?name={ingredient.name[:2]}', False),
+            ('ingredients.retrieve', 'get',
+             f'/api/ingredients/{ingredient.id}/', False),
+            ('tags.list', 'get', '/api/tags/', False),
+            ('tags.retrieve', 'get', f'/api/tags/{tag.id}/', False),
+            ('users.list', 'get', '/api/users/', True),
+            ('users.retrieve', 'get', f'/api/users/{author_id}/', True),
+            ('users.me', 'get', '/api/users/me/', True),
+            ('users.subscriptions', 'get',
+             '/api/users/subscriptions/?recipes_limit=3', True),
+            ('users.subscribe', 'get',
+             f'/api/users/{author_id}/subscribe/', True),
+            ('users.subscribe.delete', 'delete',
+             f'/api/users/{author_id}/subscribe/', True),
+        ]
+
+    def measure(self, name, client, method, url, runs, data=None):
+        cache.clear()
+        ingredient_index.invalidate()
+        kwargs = {}
+        if data is not None:
+            kwargs = {'data': json.dumps(data),
+                      'content_type': 'application/json'}
+        timings = []
+        query_counts = []
+        for _ in range(runs):
+            with CaptureQueriesContext(connection) as queries:
+                started = time.perf_counter()
+                response = getattr(client, method)(url, **kwargs)
+                content = (b''.join(response.streaming_content)
+                           if response.streaming else response.content)
+                timings.append((time.perf_counter() - started) * 1000)
+            query_counts.append(len(queries))
+            if not 200 <= response.status_code < 300:
+                raise CommandError(
+                    f'{name}: {method.upper()} {url} returned '
+                    f'{response.status_code}'
+                )
+        return {
+            'status': response.status_code,
+            'queries': query_counts[0],
+            'warm_queries': query_counts[-1],
+            'bytes': len(content),
+            **summarize(timings),
+        }
+
+    def compare(self, results, baseline_path):
+        with open(baseline_path, encoding='utf-8') as baseline_file:
+            baseline = json.load(baseline_file)['results']
+        regressions = []
+        for name, result in results.items():
+            before = baseline.get(name)
+            if before is None:
+                continue
+            self.stdout.write(
+                f'{name}: queries {before["queries"]} -> {result["queries"]}'
+                f', warm {before.get("warm_queries")} -> '
+                f'{result["warm_queries"]}'
+                f', p50 {before["p50_ms"]} -> {result["p50_ms"]}ms'
+            )
+            if (result['queries'] > before['queries']
+                    or result['warm_queries'] > before.get(
+                        'warm_queries', result['warm_queries'])):
+                regressions.append(name)
+        if regressions:
+            raise CommandError(
+                f'More queries than baseline: {", ".join(regressions)}'
+            )
+
+    def run_benchmark(self, options):
+        rng = random.Random(options['seed'])
+        results = {}
+        with transaction.atomic():
+            user_ids = self.seed(options, rng)
+            token = Token.objects.create(user_id=user_ids[0])
+            clients = {
+                True: Client(HTTP_AUTHORIZATION=f'Token {token.key}'),
+                False: Client(),
+            }
+            for name, method, url, authenticated, *data in (
+                self.get_endpoints(user_ids)
+            ):
+                runs = 1 if method != 'get' or name.endswith(
+                    ('favorite', 'shopping_cart', 'subscribe')
+                ) else options['runs']
+                results[name] = self.measure(
+                    name, clients[authenticated], method, url, runs, *data
+                )
+            transaction.set_rollback(True)
+        return results
+
+    def handle(self, *args, **options):
+        with tempfile.TemporaryDirectory() as media_root:
+            with override_settings(CACHES=BENCHMARK_CACHES,
+                                   MEDIA_ROOT=media_root):
+                results = self.run_benchmark(options)
+        report = {
+            'meta': {
+                'django': django.get_version(),
+                'database': connection.vendor,
+                **{key: options[key] for key in (
+                    'users', 'recipes', 'ingredients', 'tags', 'runs', 'seed'
+                )},
+            },
+            'results': results,
+        }
+        output = json.dumps(report, ensure_ascii=False, indent=2,
+                            sort_keys=True)
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as file:
+                file.write(output)
+        else:
+            sys.stdout.write(output + '\n')
+        if options['compare']:
+            self.compare(results, options['compare'])
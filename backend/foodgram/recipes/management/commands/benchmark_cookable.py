@@ -0,0 +1,50 @@
+import random
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from recipes.benchmarks import (seed_ingredients, seed_recipes, seed_users,
+                                summarize)
+from recipes.matching import match_recipes
+
+
+class Command(BaseCommand):
+    help = 'Benchmark "what can I cook" matching on synthetic recipes'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--recipes', type=int, default=100000)
+        parser.add_argument('--ingredients', type=int, default=2000)
+        parser.add_argument('--pantry', type=int, default=20)
+        parser.add_argument('--runs', type=int, default=20)
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument('--seed', type=int, default=0)
+
+    def seed(self, options, rng):
+        author_ids = seed_users(1)
+        ingredient_ids = seed_ingredients(options['ingredients'])
+        seed_recipes(options['recipes'], author_ids, ingredient_ids, rng,
+                     batch_size=options['batch_size'])
+        return ingredient_ids
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        with transaction.atomic():
+            started = time.perf_counter()
+            ingredient_ids = self.seed(options, rng)
+            self.stdout.write(
+                f'Seeded {options["recipes"]} recipes in '
+                f'{time.perf_counter() - started:.1f}s'
+            )
+            timings = []
+            for _ in range(options['runs']):
+                pantry = rng.sample(ingredient_ids, options['pantry'])
+                started = time.perf_counter()
+                list(match_recipes(pantry)[:6])
+                timings.append((time.perf_counter() - started) * 1000)
+            summary = summarize(timings)
+            self.stdout.write(self.style.SUCCESS(
+                f'p50={summary["p50_ms"]}ms p95={summary["p95_ms"]}ms '
+                f'max={max(timings):.1f}ms'
+            ))
+            transaction.set_rollback(True)
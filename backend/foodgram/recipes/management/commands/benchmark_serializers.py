@@ -0,0 +1,102 @@
+import random
+import time
+
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.test import RequestFactory, override_settings
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+
+from recipes.benchmarks import (BENCHMARK_CACHES, seed_ingredients,
+                                seed_recipes, seed_relations, seed_tags,
+                                seed_users, summarize)
+from recipes.models import Recipe
+from recipes.representations import (represent_cached_recipes,
+                                     user_flag_rows)
+from recipes.serializers import RecipeSerializer
+from recipes.views import RecipeViewSet
+from users.models import User
+
+
+class Command(BaseCommand):
+    help = ('Time the DRF recipe serializer against the cached flat read '
+            'path, cold and warm')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--recipes', type=int, default=1000)
+        parser.add_argument('--page-size', type=int, default=100)
+        parser.add_argument('--runs', type=int, default=20)
+        parser.add_argument('--seed', type=int, default=0)
+
+    def seed(self, options, rng):
+        user_ids = seed_users(50)
+        tag_ids = seed_tags(10)
+        ingredient_ids = seed_ingredients(500)
+        seed_recipes(options['recipes'], user_ids, ingredient_ids, rng,
+                     tag_ids=tag_ids)
+        seed_relations(
+            user_ids, list(Recipe.objects.values_list('id', flat=True)), rng
+        )
+        return User.objects.get(id=user_ids[0])
+
+    def get_view(self, user, action):
+        request = Request(RequestFactory().get('/api/recipes/'))
+        request.user = user
+        view = RecipeViewSet(
+            request=request, action=action, format_kwarg=None, kwargs={}
+        )
+        return view, request
+
+    def render_serializer(self, view, request, page_size):
+        recipes = view.get_queryset()[:page_size]
+        return JSONRenderer().render(RecipeSerializer(
+            recipes, many=True, context={'request': request, 'view': view}
+        ).data)
+
+    def render_cached(self, view, request, page_size):
+        rows = user_flag_rows(view.get_queryset())[:page_size]
+        return JSONRenderer().render(represent_cached_recipes(
+            list(rows), request, list_image=view.action == 'list'
+        ))
+
+    def time_render(self, render, view, request, runs, page_size,
+                    cold=False):
+        timings = []
+        for _ in range(runs):
+            if cold:
+                cache.clear()
+            started = time.perf_counter()
+            render(view, request, page_size)
+            timings.append((time.perf_counter() - started) * 1000)
+        return summarize(timings)
+
+    @override_settings(CACHES=BENCHMARK_CACHES)
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        with transaction.atomic():
+            user = self.seed(options, rng)
+            for label, current_user in (('authenticated', user),
+                                        ('anonymous', AnonymousUser())):
+                for action in ('list', 'retrieve'):
+                    view, request = self.get_view(current_user, action)
+                    drf = self.time_render(
+                        self.render_serializer, view, request,
+                        options['runs'], options['page_size'],
+                    )
+                    cold = self.time_render(
+                        self.render_cached, view, request,
+                        options['runs'], options['page_size'], cold=True,
+                    )
+                    warm = self.time_render(
+                        self.render_cached, view, request,
+                        options['runs'], options['page_size'],
+                    )
+                    self.stdout.write(
+                        f'{label} {action}: serializer p50={drf["p50_ms"]}ms '
+                        f'p95={drf["p95_ms"]}ms, cold p50={cold["p50_ms"]}ms '
+                        f'p95={cold["p95_ms"]}ms, warm p50={warm["p50_ms"]}ms '
+                        f'p95={warm["p95_ms"]}ms'
+                    )
+            transaction.set_rollback(True)
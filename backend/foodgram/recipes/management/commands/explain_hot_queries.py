@@ -0,0 +1,73 @@
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.db.models import Exists, OuterRef
+
+from recipes.models import (FavouriteRecipe, Ingredient, IngredientInRecipe,
+                            Recipe, ShoppingCartRecipe, Tag)
+from users.models import Follow, User
+
+EXPECTED_INDEXES = {
+    'ingredient name prefix': 'ingredient_name_upper_idx',
+}
+
+
+class Command(BaseCommand):
+    help = 'Print EXPLAIN plans for the hot API queries'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--analyze', action='store_true',
+            help='Run EXPLAIN ANALYZE (PostgreSQL only)',
+        )
+
+    def get_queries(self):
+        user = User.objects.order_by('id').first()
+        tag = Tag.objects.order_by('id').first()
+        ingredient = Ingredient.objects.order_by('id').first()
+        prefix = ingredient.name[:3] if ingredient else 'а'
+        queries = {
+            'ingredient name prefix': Ingredient.objects.filter(
+                name__istartswith=prefix
+            ),
+            'recipes by tag slug': Recipe.objects.filter(
+                tags__slug=tag.slug if tag else ''
+            ),
+            'newest recipes': Recipe.objects.all()[:6],
+        }
+        if user is None:
+            return queries
+        queries.update({
+            'recipes by author': Recipe.objects.filter(author=user)[:6],
+            'recipe flags': Recipe.objects.annotate(
+                is_favorited=Exists(FavouriteRecipe.objects.filter(
+                    user=user, recipe=OuterRef('pk')
+                )),
+                is_in_shopping_cart=Exists(ShoppingCartRecipe.objects.filter(
+                    user=user, recipe=OuterRef('pk')
+                )),
+            )[:6],
+            'shopping list': IngredientInRecipe.objects.filter(
+                recipe__cart__user=user
+            ),
+            'subscriptions': Follow.objects.filter(user=user),
+            'followers': Follow.objects.filter(following=user),
+        })
+        return queries
+
+    def handle(self, *args, **options):
+        explain_options = {'analyze': True} if options['analyze'] else {}
+        for title, queryset in self.get_queries().items():
+            self.stdout.write(self.style.MIGRATE_HEADING(title))
+            self.stdout.write(str(queryset.query))
+            plan = queryset.explain(**explain_options)
+            self.stdout.write(plan)
+            index = EXPECTED_INDEXES.get(title)
+            if index and connection.vendor == 'postgresql':
+                if index in plan:
+                    self.stdout.write(self.style.SUCCESS(f'uses {index}'))
+                else:
+                    self.stdout.write(self.style.WARNING(
+                        f'does not use {index}; on a small table the '
+                        f'planner may prefer a sequential scan'
+                    ))
+            self.stdout.write('')
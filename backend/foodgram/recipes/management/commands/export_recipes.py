@@ -0,0 +1,79 @@
+import json
+import sys
+
+from django.core.management.base import BaseCommand
+from django.db.models import Prefetch
+
+from recipes.models import IngredientInRecipe, Recipe
+
+
+class Command(BaseCommand):
+    help = 'Export recipes as JSON Lines'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'path', nargs='?', default='-',
+            help='Output file, "-" for stdout',
+        )
+        parser.add_argument('--batch-size', type=int, default=500)
+
+    def iter_recipes(self, batch_size):
+        recipe_ids = Recipe.objects.order_by('id').values_list(
+            'id', flat=True
+        )
+        last_id = 0
+        while True:
+            ids = list(recipe_ids.filter(id__gt=last_id)[:batch_size])
+            if not ids:
+                return
+            yield from Recipe.objects.filter(id__in=ids).order_by(
+                'id'
+            ).select_related('author').prefetch_related(
+                'tags',
+                Prefetch(
+                    'ingredients',
+                    queryset=IngredientInRecipe.objects.select_related(
+                        'ingredient'
+                    ),
+                ),
+            )
+            last_id = ids[-1]
+
+    def serialize(self, recipe):
+        return {
+            'id': recipe.id,
+            'author': recipe.author.email,
+            'name': recipe.name,
+            'text': recipe.text,
+            'image': recipe.image.name,
+            'cooking_time': recipe.cooking_time,
+            'tags': [
+                {'name': tag.name, 'color': tag.color, 'slug': tag.slug}
+                for tag in recipe.tags.all()
+            ],
+            'ingredients': [
+                {
+                    'name': item.ingredient.name,
+                    'measurement_unit': item.ingredient.measurement_unit,
+                    'amount': item.amount,
+                }
+                for item in recipe.ingredients.all()
+            ],
+        }
+
+    def handle(self, *args, **options):
+        path = options['path']
+        stream = sys.stdout if path == '-' else open(
+            path, 'w', encoding='utf-8'
+        )
+        exported = 0
+        try:
+            for recipe in self.iter_recipes(options['batch_size']):
+                stream.write(json.dumps(
+                    self.serialize(recipe), ensure_ascii=False
+                ) + '\n')
+                exported += 1
+        finally:
+            if stream is not sys.stdout:
+                stream.close()
+        self.stderr.write(f'Exported recipes: {exported}')
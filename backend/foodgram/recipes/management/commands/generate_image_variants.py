@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand
+
+from recipes.images import generate_image_variants
+from recipes.models import Recipe
+
+
+class Command(BaseCommand):
+    help = 'Generate resized WebP/JPEG variants of recipe images'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--all', action='store_true',
+            help='Regenerate variants that already exist',
+        )
+
+    def handle(self, *args, **options):
+        recipes = Recipe.objects.exclude(image='')
+        if not options['all']:
+            recipes = recipes.filter(image_variants={})
+        generated = 0
+        for recipe_id in recipes.values_list('id', flat=True).iterator():
+            generate_image_variants(recipe_id)
+            generated += 1
+        self.stdout.write(self.style.SUCCESS(
+            f'Generated variants for recipes: {generated}'
+        ))
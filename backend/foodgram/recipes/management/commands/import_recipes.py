@@ -0,0 +1,195 @@
+import io
+import json
+import os
+import sys
+from collections import Counter
+from itertools import islice
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.db.models import F
+
+from recipes.caching import bump_dependencies
+from recipes.feed import fan_out_recipes
+from recipes.models import Ingredient, IngredientInRecipe, Recipe, Tag
+from recipes.search import update_search_vectors
+from users.models import User
+
+
+class Command(BaseCommand):
+    help = ('Import recipes from JSON Lines produced by export_recipes. '
+            'Recipes whose author already has a recipe with the same name '
+            'are skipped, so resuming or repeating an import does not '
+            'duplicate them.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Input file, "-" for stdin')
+        parser.add_argument('--batch-size', type=int, default=500)
+        parser.add_argument(
+            '--state',
+            help='Progress file used to resume an interrupted import '
+                 '(default: <path>.progress)',
+        )
+        parser.add_argument(
+            '--default-author',
+            help='Email of the author for recipes whose author is missing',
+        )
+
+    def read_state(self, state_path):
+        if state_path and os.path.exists(state_path):
+            with open(state_path) as state:
+                return int(state.read().strip() or 0)
+        return 0
+
+    def write_state(self, state_path, lines_done):
+        if state_path:
+            with open(state_path, 'w') as state:
+                state.write(str(lines_done))
+
+    def resolve_authors(self, records, default_author):
+        emails = {record['author'] for record in records}
+        authors = dict(User.objects.filter(
+            email__in=emails
+        ).values_list('email', 'id'))
+        for email in emails - authors.keys():
+            if default_author is None:
+                raise CommandError(f'Автор {email} не найден')
+            authors[email] = default_author.id
+        return authors
+
+    def resolve_tags(self, records):
+        tags = {
+            tag['slug']: tag for record in records for tag in record['tags']
+        }
+        existing = dict(Tag.objects.filter(
+            slug__in=tags
+        ).values_list('slug', 'id'))
+        for slug in tags.keys() - existing.keys():
+            tag = Tag.objects.create(**tags[slug])
+            existing[slug] = tag.id
+        return existing
+
+    def resolve_ingredients(self, records):
+        pairs = {
+            (item['name'], item['measurement_unit'])
+            for record in records for item in record['ingredients']
+        }
+        Ingredient.objects.bulk_create(
+            [Ingredient(name=name, measurement_unit=unit)
+             for name, unit in pairs],
+            ignore_conflicts=True,
+        )
+        names = {name for name, _ in pairs}
+        return {
+            (name, unit): pk
+            for pk, name, unit in Ingredient.objects.filter(
+                name__in=names
+            ).values_list('id', 'name', 'measurement_unit')
+        }
+
+    def skip_existing(self, records, authors):
+        existing = set(Recipe.objects.filter(
+            author_id__in=set(authors.values()),
+            name__in={record['name'] for record in records},
+        ).values_list('author_id', 'name'))
+        new_records = []
+        for record in records:
+            key = (authors[record['author']], record['name'])
+            if key not in existing:
+                existing.add(key)
+                new_records.append(record)
+        return new_records
+
+    def create_recipes(self, recipes):
+        if not connection.features.can_return_rows_from_bulk_insert:
+            for recipe in recipes:
+                recipe.save()
+            return recipes
+        recipes = Recipe.objects.bulk_create(recipes)
+        authors = Counter(recipe.author_id for recipe in recipes)
+        for author_id, count in authors.items():
+            User.objects.filter(id=author_id).update(
+                recipes_count=F('recipes_count') + count
+            )
+        bump_dependencies(['recipes:list'] + [
+            f'recipes:list:author:{author_id}' for author_id in authors
+        ])
+        fan_out_recipes(recipes)
+        return recipes
+
+    @transaction.atomic
+    def import_batch(self, records, default_author):
+        authors = self.resolve_authors(records, default_author)
+        records = self.skip_existing(records, authors)
+        if not records:
+            return 0
+        tags = self.resolve_tags(records)
+        ingredients = self.resolve_ingredients(records)
+        recipes = self.create_recipes([
+            Recipe(
+                author_id=authors[record['author']],
+                name=record['name'],
+                text=record['text'],
+                image=record['image'],
+                cooking_time=record['cooking_time'],
+                ingredients_count=len(record['ingredients']),
+            )
+            for record in records
+        ])
+        Recipe.tags.through.objects.bulk_create([
+            Recipe.tags.through(recipe_id=recipe.id, tag_id=tags[tag['slug']])
+            for recipe, record in zip(recipes, records)
+            for tag in record['tags']
+        ])
+        bump_dependencies([f'recipes:list:tag:{slug}' for slug in tags])
+        IngredientInRecipe.objects.bulk_create([
+            IngredientInRecipe(
+                recipe_id=recipe.id,
+                ingredient_id=ingredients[
+                    (item['name'], item['measurement_unit'])
+                ],
+                amount=item['amount'],
+            )
+            for recipe, record in zip(recipes, records)
+            for item in record['ingredients']
+        ])
+        update_search_vectors([recipe.id for recipe in recipes])
+        return len(recipes)
+
+    def handle(self, *args, **options):
+        path = options['path']
+        state_path = options['state'] or (
+            None if path == '-' else f'{path}.progress'
+        )
+        default_author = None
+        if options['default_author']:
+            default_author = User.objects.filter(
+                email=options['default_author']
+            ).first()
+            if default_author is None:
+                raise CommandError('Автор по умолчанию не найден')
+        lines_done = self.read_state(state_path)
+        stream = (io.TextIOWrapper(sys.stdin.buffer, encoding='utf-8')
+                  if path == '-' else open(path, encoding='utf-8'))
+        imported = 0
+        with stream:
+            lines = islice(stream, lines_done, None)
+            while True:
+                chunk = list(islice(lines, options['batch_size']))
+                if not chunk:
+                    break
+                records = [json.loads(line) for line in chunk
+                           if line.strip()]
+                if records:
+                    imported += self.import_batch(records, default_author)
+                lines_done += len(chunk)
+                self.write_state(state_path, lines_done)
+                self.stderr.write(f'\rImported recipes: {imported}',
+                                  ending='')
+        self.stderr.write('')
+        if state_path and os.path.exists(state_path):
+            os.remove(state_path)
+        self.stdout.write(self.style.SUCCESS(
+            f'Imported recipes: {imported}. Run generate_image_variants '
+            f'to build image variants.'
+        ))
@@ -1,20 +1,116 @@
+import csv
+import io
 import json
+import os
+import re
+import sys
+import time
+from itertools import islice
 
-from django.core.management.base import BaseCommand
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
 from recipes.models import Ingredient
 
+SEPARATORS = re.compile(r'[\s,]*')
+
+
+def iter_json(stream, chunk_size=64 * 1024):
+    decoder = json.JSONDecoder()
+    buffer = ''
+    position = 0
+    started = False
+    eof = False
+    while True:
+        position = SEPARATORS.match(buffer, position).end()
+        if not started and position < len(buffer):
+            started = True
+            if buffer[position] == '[':
+                position += 1
+                continue
+        if started and buffer.startswith(']', position):
+            return
+        try:
+            item, position = decoder.raw_decode(buffer, position)
+        except json.JSONDecodeError:
+            if eof:
+                if buffer[position:].strip():
+                    raise CommandError('Некорректный JSON во входных данных')
+                return
+            chunk = stream.read(chunk_size)
+            eof = not chunk
+            buffer = buffer[position:] + chunk
+            position = 0
+            continue
+        yield item
+
+
+def iter_csv(stream):
+    for row in csv.DictReader(stream):
+        yield {
+            'name': row['name'],
+            'measurement_unit': row['measurement_unit'],
+        }
+
+
+def iter_batches(iterable, size):
+    iterator = iter(iterable)
+    while True:
+        batch = list(islice(iterator, size))
+        if not batch:
+            return
+        yield batch
+
 
 class Command(BaseCommand):
-    help = 'Load ingredients from json'
+    help = 'Load ingredients from json or csv'
 
-    def handle(self, *args, **options):
-        db_objects = []
-        with open('ingredients.json') as f:
-            data = json.load(f)
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'path', nargs='?',
+            default=os.path.join(settings.BASE_DIR, 'ingredients.json'),
+            help='File to load, "-" for stdin',
+        )
+        parser.add_argument(
+            '--format', choices=('json', 'csv'),
+            help='Input format, detected from the file extension by default',
+        )
+        parser.add_argument('--batch-size', type=int, default=1000)
 
-            for ingredient_data in data:
-                db_objects.append(
-                    Ingredient(**ingredient_data)
-                )
+    def open_input(self, path):
+        if path == '-':
+            return io.TextIOWrapper(sys.stdin.buffer, encoding='utf-8')
+        try:
+            return open(path, encoding='utf-8', newline='')
+        except OSError as error:
+            raise CommandError(error)
 
-        Ingredient.objects.bulk_create(db_objects)
+    def handle(self, *args, **options):
+        path = options['path']
+        input_format = options['format'] or (
+            'csv' if path.lower().endswith('.csv') else 'json'
+        )
+        parse = iter_csv if input_format == 'csv' else iter_json
+        count_before = Ingredient.objects.count()
+        processed = 0
+        started = time.perf_counter()
+        with self.open_input(path) as stream:
+            for batch in iter_batches(parse(stream), options['batch_size']):
+                Ingredient.objects.bulk_create(
+                    (Ingredient(name=item['name'],
+                                measurement_unit=item['measurement_unit'])
+                     for item in batch),
+                    ignore_conflicts=True,
+                )
+                processed += len(batch)
+                elapsed = time.perf_counter() - started
+                self.stderr.write(
+                    f'\r{processed} rows, {processed / elapsed:.0f} rows/s',
+                    ending='',
+                )
+        elapsed = time.perf_counter() - started
+        created = Ingredient.objects.count() - count_before
+        self.stderr.write('')
+        self.stdout.write(self.style.SUCCESS(
+            f'Processed {processed} rows in {elapsed:.1f}s, '
+            f'created {created}, skipped {processed - created}'
+        ))
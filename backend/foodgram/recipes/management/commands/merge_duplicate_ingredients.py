@@ -0,0 +1,69 @@
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.db.models import Count, F, Min
+
+from recipes.models import Ingredient, IngredientInRecipe
+
+
+class Command(BaseCommand):
+    help = ('Merge ingredients with the same name and measurement unit '
+            'before the unique_ingredient_unit constraint is applied')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help='Only report the duplicate groups',
+        )
+
+    def merge(self, name, measurement_unit, keep_id):
+        duplicate_ids = list(Ingredient.objects.filter(
+            name=name, measurement_unit=measurement_unit,
+        ).exclude(id=keep_id).values_list('id', flat=True))
+        merged = 0
+        for row in IngredientInRecipe.objects.filter(
+            ingredient_id__in=duplicate_ids
+        ).values('id', 'recipe_id', 'amount'):
+            kept = IngredientInRecipe.objects.filter(
+                recipe_id=row['recipe_id'], ingredient_id=keep_id
+            ).update(amount=F('amount') + row['amount'])
+            if kept:
+                IngredientInRecipe.objects.filter(id=row['id']).delete()
+                merged += 1
+            else:
+                IngredientInRecipe.objects.filter(id=row['id']).update(
+                    ingredient_id=keep_id
+                )
+        Ingredient.objects.filter(id__in=duplicate_ids).delete()
+        return len(duplicate_ids), merged
+
+    def handle(self, *args, **options):
+        table = Ingredient._meta.db_table
+        if table not in connection.introspection.table_names():
+            self.stdout.write(f'{table} does not exist yet, nothing to merge')
+            return
+        groups = Ingredient.objects.values(
+            'name', 'measurement_unit'
+        ).annotate(
+            keep_id=Min('id'), total=Count('id')
+        ).filter(total__gt=1).order_by('name', 'measurement_unit')
+        removed = merged = 0
+        for group in groups:
+            self.stdout.write(
+                f'{group["name"]} ({group["measurement_unit"]}): '
+                f'{group["total"]} rows, keeping id {group["keep_id"]}'
+            )
+            if options['dry_run']:
+                continue
+            with transaction.atomic():
+                group_removed, group_merged = self.merge(
+                    group['name'], group['measurement_unit'],
+                    group['keep_id'],
+                )
+            removed += group_removed
+            merged += group_merged
+        if options['dry_run']:
+            return
+        self.stdout.write(self.style.SUCCESS(
+            f'Removed {removed} duplicate ingredients, merged {merged} '
+            f'recipe rows into existing ones'
+        ))
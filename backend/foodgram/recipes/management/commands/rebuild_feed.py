@@ -0,0 +1,35 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from recipes.feed import rebuild_feed, trim_feed
+from users.models import Follow
+
+
+class Command(BaseCommand):
+    help = 'Backfill or trim recipe feeds of users with subscriptions'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--trim', action='store_true',
+            help='Only trim existing feeds to FEED_MAX_LENGTH',
+        )
+        parser.add_argument(
+            '--user', type=int, action='append', dest='users',
+            help='Limit to the given user id (can be repeated)',
+        )
+
+    def handle(self, *args, **options):
+        user_ids = options['users'] or Follow.objects.order_by(
+            'user_id'
+        ).values_list('user_id', flat=True).distinct()
+        processed = 0
+        for user_id in user_ids:
+            if options['trim']:
+                trim_feed(user_id)
+            else:
+                with transaction.atomic():
+                    rebuild_feed(user_id)
+            processed += 1
+        self.stdout.write(self.style.SUCCESS(
+            f'Processed feeds: {processed}'
+        ))
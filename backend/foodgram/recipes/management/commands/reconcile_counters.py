@@ -0,0 +1,53 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count, F, OuterRef, Q, Subquery, Value
+from django.db.models.functions import Coalesce
+
+from recipes.models import (FavouriteRecipe, IngredientInRecipe, Recipe,
+                            ShoppingCartRecipe)
+from users.models import Follow, User
+
+
+def count_of(model, field):
+    return Coalesce(Subquery(
+        model.objects.filter(
+            **{field: OuterRef('pk')}
+        ).order_by().values(field).annotate(
+            total=Count('pk')
+        ).values('total')
+    ), Value(0))
+
+
+COUNTERS = (
+    (Recipe, 'favorites_count', FavouriteRecipe, 'recipe'),
+    (Recipe, 'cart_count', ShoppingCartRecipe, 'recipe'),
+    (Recipe, 'ingredients_count', IngredientInRecipe, 'recipe'),
+    (User, 'recipes_count', Recipe, 'author'),
+    (User, 'followers_count', Follow, 'following'),
+)
+
+
+class Command(BaseCommand):
+    help = 'Repair drift in denormalized recipe and user counters'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help='Only report how many rows have drifted',
+        )
+
+    def handle(self, *args, **options):
+        for model, counter, source, field in COUNTERS:
+            actual = count_of(source, field)
+            drifted = model.objects.annotate(
+                actual_count=actual
+            ).filter(~Q(**{counter: F('actual_count')}))
+            drift = drifted.count()
+            if drift and not options['dry_run']:
+                with transaction.atomic():
+                    model.objects.filter(
+                        pk__in=drifted.values('pk')
+                    ).update(**{counter: actual})
+            self.stdout.write(
+                f'{model._meta.label}.{counter}: {drift} drifted'
+            )
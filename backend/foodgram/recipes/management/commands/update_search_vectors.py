@@ -0,0 +1,26 @@
+from itertools import islice
+
+from django.core.management.base import BaseCommand, CommandError
+
+from recipes.models import Recipe
+from recipes.search import is_full_text_supported, update_search_vectors
+
+
+class Command(BaseCommand):
+    help = 'Rebuild full-text search vectors of recipes'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        if not is_full_text_supported():
+            raise CommandError('Full-text search requires PostgreSQL')
+        updated = 0
+        recipe_ids = Recipe.objects.values_list('id', flat=True).iterator()
+        while True:
+            batch = list(islice(recipe_ids, options['batch_size']))
+            if not batch:
+                break
+            update_search_vectors(batch)
+            updated += len(batch)
+        self.stdout.write(self.style.SUCCESS(f'Updated recipes: {updated}'))
@@ -0,0 +1,20 @@
+from django.db.models import Count, F, FloatField
+from django.db.models.functions import Cast, Greatest
+
+from .models import Recipe
+
+
+def match_recipes(ingredient_ids, queryset=None):
+    if queryset is None:
+        queryset = Recipe.objects.all()
+    return queryset.filter(
+        ingredients__ingredient__in=ingredient_ids
+    ).annotate(
+        matched_count=Count('ingredients')
+    ).annotate(
+        total_count=Greatest(F('ingredients_count'), F('matched_count'))
+    ).annotate(
+        coverage=(Cast('matched_count', FloatField())
+                  / Cast('total_count', FloatField())),
+        missing_count=F('total_count') - F('matched_count'),
+    ).order_by('-coverage', 'missing_count', '-id')
@@ -1,7 +1,9 @@
+from django.contrib.postgres.search import SearchVectorField
 from django.core.validators import MinValueValidator
 from django.db import models
 
 from users.models import User
+from .indexes import SearchVectorIndex, UpperPatternIndex
 
 
 class Ingredient(models.Model):
@@ -18,6 +20,14 @@ class Ingredient(models.Model):
         return self.name
 
     class Meta:
+        constraints = [models.UniqueConstraint(
+            fields=['name', 'measurement_unit'],
+            name='unique_ingredient_unit',
+        )]
+        indexes = [UpperPatternIndex(
+            fields=['name'],
+            name='ingredient_name_upper_idx',
+        )]
         verbose_name = 'Ингредиент'
         verbose_name_plural = 'Ингредиенты'
 
@@ -62,6 +72,11 @@ class Recipe(models.Model):
         upload_to='recipe_images/',
         verbose_name='фото блюда',
     )
+    image_variants = models.JSONField(
+        default=dict,
+        editable=False,
+        verbose_name='уменьшенные копии фото',
+    )
     text = models.TextField(
         verbose_name='описание рецепта',
     )
@@ -77,11 +92,42 @@ class Recipe(models.Model):
         default=1,
         verbose_name='время приготовления',
     )
+    favorites_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name='в избранном',
+    )
+    cart_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name='в корзинах',
+    )
+    ingredients_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name='количество ингредиентов',
+    )
+    search_vector = SearchVectorField(
+        null=True,
+        editable=False,
+        verbose_name='поисковый вектор',
+    )
 
     def __str__(self):
         return self.name
 
     class Meta:
+        ordering = ['-id']
+        indexes = [
+            models.Index(
+                fields=['author', '-id'],
+                name='recipe_author_newest_idx',
+            ),
+            SearchVectorIndex(
+                fields=['search_vector'],
+                name='recipe_search_vector_idx',
+            ),
+        ]
         verbose_name = 'Рецепт'
         verbose_name_plural = 'Рецепты'
 
@@ -160,3 +206,30 @@ class ShoppingCartRecipe(models.Model):
         )]
         verbose_name = 'Рецепт в корзине'
         verbose_name_plural = 'Рецепты в корзине'
+
+
+class FeedRecipe(models.Model):
+    recipe = models.ForeignKey(
+        Recipe,
+        on_delete=models.CASCADE,
+        related_name='feed_entries',
+        verbose_name='рецепт',
+    )
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='feed',
+        verbose_name='пользователь',
+    )
+
+    class Meta:
+        constraints = [models.UniqueConstraint(
+            fields=['user', 'recipe'],
+            name='unique_recipe_in_feed',
+        )]
+        indexes = [models.Index(
+            fields=['user', '-recipe'],
+            name='feed_user_newest_idx',
+        )]
+        verbose_name = 'Рецепт в ленте'
+        verbose_name_plural = 'Рецепты в ленте'
@@ -1,6 +1,63 @@
-from rest_framework.pagination import PageNumberPagination
+from collections import OrderedDict
+
+from rest_framework.exceptions import ValidationError
+from rest_framework.pagination import CursorPagination, PageNumberPagination
+from rest_framework.response import Response
+
+
+class CustomCursorPaginator(CursorPagination):
+    page_size = 6
+    page_size_query_param = 'limit'
+    ordering = '-id'
+    count_query_param = 'count'
+    keysets = (('id',), ('-id',))
+
+    def get_ordering(self, request, queryset, view):
+        ordering = tuple(
+            queryset.query.order_by
+            or queryset.model._meta.ordering
+            or (self.ordering,)
+        )
+        if ordering not in self.keysets + getattr(view, 'cursor_keysets', ()):
+            raise ValidationError({
+                'pagination': 'Курсорная пагинация недоступна '
+                              'для этой сортировки'
+            })
+        return ordering
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.count = None
+        if request.query_params.get(self.count_query_param) != 'false':
+            self.count = queryset.count()
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        return Response(OrderedDict([
+            ('count', self.count),
+            ('next', self.get_next_link()),
+            ('previous', self.get_previous_link()),
+            ('results', data),
+        ]))
 
 
 class CustomPaginator(PageNumberPagination):
     page_size = 6
     page_size_query_param = 'limit'
+    mode_query_param = 'pagination'
+    cursor_paginator_class = CustomCursorPaginator
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.cursor_paginator = None
+        cursor_param = self.cursor_paginator_class.cursor_query_param
+        if (request.query_params.get(self.mode_query_param) == 'cursor'
+                or cursor_param in request.query_params):
+            self.cursor_paginator = self.cursor_paginator_class()
+            return self.cursor_paginator.paginate_queryset(
+                queryset, request, view
+            )
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        if self.cursor_paginator is not None:
+            return self.cursor_paginator.get_paginated_response(data)
+        return super().get_paginated_response(data)
@@ -0,0 +1,203 @@
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.cache import cache
+
+from foodgram.metrics import record_cache_lookup
+from .caching import (WRITE_GENERATION, get_dependency_tokens,
+                      is_write_generation)
+from .models import IngredientInRecipe, Recipe
+
+RECIPE_VALUES = (
+    'id', 'name', 'image', 'image_variants', 'text', 'cooking_time',
+    'author_id', 'author__email', 'author__username', 'author__first_name',
+    'author__last_name',
+)
+USER_FLAGS = ('is_favorited', 'is_in_shopping_cart', 'is_author_subscribed')
+FRAGMENT_KEY = 'recipe-fragment:{}'
+
+
+def get_user_flags(queryset):
+    return [name for name in USER_FLAGS if name in queryset.query.annotations]
+
+
+def user_flag_rows(queryset):
+    return queryset.prefetch_related(None).values(
+        'id', *get_user_flags(queryset)
+    )
+
+
+def get_image_url(name):
+    if not name:
+        return None
+    return Recipe._meta.get_field('image').storage.url(name)
+
+
+def get_list_image_url(row):
+    variant, image_format = settings.RECIPE_LIST_IMAGE
+    name = row['image_variants'].get(variant, {}).get(image_format)
+    return get_image_url(name or row['image'])
+
+
+def build_absolute_url(url, request):
+    if url is None or request is None:
+        return url
+    return request.build_absolute_uri(url)
+
+
+def load_tags(recipe_ids):
+    tags = defaultdict(list)
+    for row in Recipe.tags.through.objects.filter(
+        recipe_id__in=recipe_ids
+    ).order_by('tag_id').values(
+        'recipe_id', 'tag__id', 'tag__name', 'tag__color', 'tag__slug'
+    ):
+        tags[row['recipe_id']].append({
+            'id': row['tag__id'],
+            'name': row['tag__name'],
+            'color': row['tag__color'],
+            'slug': row['tag__slug'],
+        })
+    return tags
+
+
+def load_ingredients(recipe_ids):
+    ingredients = defaultdict(list)
+    for row in IngredientInRecipe.objects.filter(
+        recipe_id__in=recipe_ids
+    ).order_by('id').values(
+        'recipe_id', 'ingredient__id', 'ingredient__name',
+        'ingredient__measurement_unit', 'amount'
+    ):
+        ingredients[row['recipe_id']].append({
+            'id': row['ingredient__id'],
+            'name': row['ingredient__name'],
+            'measurement_unit': row['ingredient__measurement_unit'],
+            'amount': row['amount'],
+        })
+    return ingredients
+
+
+def build_fragments(rows):
+    recipe_ids = [row['id'] for row in rows]
+    tags = load_tags(recipe_ids)
+    ingredients = load_ingredients(recipe_ids)
+    return [
+        {
+            'id': row['id'],
+            'tags': tags[row['id']],
+            'author': {
+                'email': row['author__email'],
+                'id': row['author_id'],
+                'username': row['author__username'],
+                'first_name': row['author__first_name'],
+                'last_name': row['author__last_name'],
+            },
+            'ingredients': ingredients[row['id']],
+            'name': row['name'],
+            'image': get_image_url(row['image']),
+            'list_image': get_list_image_url(row),
+            'text': row['text'],
+            'cooking_time': row['cooking_time'],
+        }
+        for row in rows
+    ]
+
+
+def compose_recipe(fragment, flags, request, list_image=False):
+    image = fragment['list_image'] if list_image else fragment['image']
+    return {
+        'id': fragment['id'],
+        'tags': fragment['tags'],
+        'author': {
+            **fragment['author'],
+            'is_subscribed': flags.get('is_author_subscribed', False),
+        },
+        'ingredients': fragment['ingredients'],
+        'is_favorited': flags.get('is_favorited', False),
+        'is_in_shopping_cart': flags.get('is_in_shopping_cart', False),
+        'name': fragment['name'],
+        'image': build_absolute_url(image, request),
+        'text': fragment['text'],
+        'cooking_time': fragment['cooking_time'],
+    }
+
+
+def get_fragment_dependencies(fragment):
+    return [
+        f'recipe:{fragment["id"]}',
+        f'user:{fragment["author"]["id"]}',
+        'ingredients',
+        *(f'tag:{tag["id"]}' for tag in fragment['tags']),
+    ]
+
+
+def load_cached_fragments(recipe_ids):
+    keys = {FRAGMENT_KEY.format(recipe_id): recipe_id
+            for recipe_id in recipe_ids}
+    cached = cache.get_many(list(keys))
+    tokens = get_dependency_tokens(list({
+        dependency
+        for entry in cached.values()
+        for dependency in entry['dependencies']
+    }))
+    fragments = {}
+    for key, recipe_id in keys.items():
+        entry = cached.get(key)
+        hit = entry is not None and all(
+            tokens[dependency] == token
+            for dependency, token in entry['dependencies'].items()
+        )
+        record_cache_lookup('fragment', hit)
+        if hit:
+            fragments[recipe_id] = entry['fragment']
+    return fragments
+
+
+def store_fragments(recipe_ids):
+    tokens = get_dependency_tokens(
+        [WRITE_GENERATION, 'ingredients']
+        + [f'recipe:{recipe_id}' for recipe_id in recipe_ids]
+    )
+    fragments = build_fragments(list(
+        Recipe.objects.filter(id__in=recipe_ids).values(*RECIPE_VALUES)
+    ))
+    dependencies = {
+        fragment['id']: get_fragment_dependencies(fragment)
+        for fragment in fragments
+    }
+    tokens.update(get_dependency_tokens(list({
+        dependency
+        for keys in dependencies.values()
+        for dependency in keys
+        if dependency not in tokens
+    })))
+    fragments_by_id = {fragment['id']: fragment for fragment in fragments}
+    if not is_write_generation(tokens):
+        return fragments_by_id
+    cache.set_many({
+        FRAGMENT_KEY.format(fragment['id']): {
+            'fragment': fragment,
+            'dependencies': {
+                dependency: tokens[dependency]
+                for dependency in dependencies[fragment['id']]
+            },
+        }
+        for fragment in fragments
+    }, settings.RECIPE_FRAGMENT_CACHE_TIMEOUT)
+    return fragments_by_id
+
+
+def represent_cached_recipes(rows, request, list_image=False):
+    recipe_ids = [row['id'] for row in rows]
+    fragments = load_cached_fragments(recipe_ids)
+    missing = [
+        recipe_id for recipe_id in recipe_ids if recipe_id not in fragments
+    ]
+    if missing:
+        fragments.update(store_fragments(missing))
+    return [
+        compose_recipe(fragments[row['id']], row, request, list_image)
+        for row in rows
+        if row['id'] in fragments
+    ]
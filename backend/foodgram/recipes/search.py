@@ -0,0 +1,57 @@
+from django.contrib.postgres.search import (SearchQuery, SearchRank,
+                                            SearchVector)
+from django.db import connection, transaction
+from django.db.models import F, OuterRef, Q, Subquery, TextField
+
+SEARCH_CONFIG = 'russian'
+
+
+def is_full_text_supported():
+    return connection.vendor == 'postgresql'
+
+
+def update_search_vectors(recipe_ids):
+    if not is_full_text_supported():
+        return
+    from django.contrib.postgres.aggregates import StringAgg
+
+    from .models import IngredientInRecipe, Recipe
+
+    ingredient_names = Subquery(
+        IngredientInRecipe.objects.filter(
+            recipe=OuterRef('pk')
+        ).order_by().values('recipe').annotate(
+            names=StringAgg('ingredient__name', ' ')
+        ).values('names'),
+        output_field=TextField(),
+    )
+    Recipe.objects.filter(pk__in=recipe_ids).update(search_vector=(
+        SearchVector('name', weight='A', config=SEARCH_CONFIG)
+        + SearchVector('text', weight='B', config=SEARCH_CONFIG)
+        + SearchVector(ingredient_names, weight='C', config=SEARCH_CONFIG)
+    ))
+
+
+def update_search_vector(recipe):
+    update_search_vectors([recipe.pk])
+
+
+def schedule_search_vector_update(recipe_ids):
+    if not is_full_text_supported():
+        return
+    recipe_ids = list(recipe_ids)
+    if recipe_ids:
+        transaction.on_commit(lambda: update_search_vectors(recipe_ids))
+
+
+def search_recipes(queryset, value):
+    if not is_full_text_supported():
+        return queryset.filter(
+            Q(name__icontains=value)
+            | Q(text__icontains=value)
+            | Q(ingredients__ingredient__name__icontains=value)
+        ).distinct()
+    query = SearchQuery(value, config=SEARCH_CONFIG, search_type='websearch')
+    return queryset.filter(search_vector=query).annotate(
+        rank=SearchRank(F('search_vector'), query)
+    ).order_by('-rank', '-id')
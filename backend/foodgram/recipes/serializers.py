@@ -1,9 +1,14 @@
-from drf_extra_fields.fields import Base64ImageField
+import json
+
+from django.db import transaction
+
 from rest_framework import serializers
 from rest_framework.serializers import ValidationError
 
 from users.models import Follow
 from users.serializers import CustomUserSerializer
+from .fields import StreamingBase64ImageField
+from .images import get_image_variant_url, schedule_image_variants
 from .models import (Ingredient, IngredientInRecipe, Recipe, Tag)
 
 
@@ -15,10 +20,7 @@ class IngredientSerializer(serializers.ModelSerializer):
 
 
 class IngredientInRecipeSerializer(serializers.ModelSerializer):
-    id = serializers.PrimaryKeyRelatedField(
-        queryset=Ingredient.objects.all(),
-        source='ingredient.id'
-    )
+    id = serializers.IntegerField(source='ingredient.id')
     name = serializers.ReadOnlyField(source='ingredient.name')
     measurement_unit = serializers.ReadOnlyField(
         source='ingredient.measurement_unit'
@@ -39,7 +41,7 @@ class TagSerializer(serializers.ModelSerializer):
 
 class RecipeSerializer(serializers.ModelSerializer):
     author = CustomUserSerializer(read_only=True)
-    image = Base64ImageField()
+    image = StreamingBase64ImageField()
     tags = TagSerializer(read_only=True, many=True)
     ingredients = IngredientInRecipeSerializer(required=True, many=True)
     is_favorited = serializers.SerializerMethodField()
@@ -52,33 +54,86 @@ class RecipeSerializer(serializers.ModelSerializer):
         model = Recipe
         read_only_fields = ('author', 'is_favorited', 'is_in_shopping_cart')
 
-    def validate_tags(self, data):
-        tags = self.initial_data.get('tags')
-        tags_set = set()
+    def parse_multipart(self, data):
+        parsed = data.dict()
+        tags = data.getlist('tags')
+        if len(tags) == 1 and tags[0].startswith('['):
+            tags = json.loads(tags[0])
+        parsed['tags'] = tags
+        if isinstance(parsed.get('ingredients'), str):
+            parsed['ingredients'] = json.loads(parsed['ingredients'])
+        return parsed
+
+    def to_internal_value(self, data):
+        if hasattr(data, 'getlist'):
+            try:
+                data = self.parse_multipart(data)
+            except ValueError:
+                raise ValidationError('Некорректный JSON в данных формы!')
+        value = super().to_internal_value(data)
+        self.tags_data = data.get('tags')
+        return value
+
+    def validate(self, data):
+        tags = self.tags_data
+        if tags is not None and not isinstance(tags, list):
+            raise ValidationError({
+                'tags': 'Передайте список идентификаторов тегов!'
+            })
         if not tags:
-            raise serializers.ValidationError('Добавьте хотя бы один тег!')
-        for tag in tags:
-            if tag in tags_set:
-                raise serializers.ValidationError(
-                    'Теги в рецепте должны быть уникальными!',
-                )
-            tags_set.add(id)
+            raise ValidationError({'tags': 'Добавьте хотя бы один тег!'})
+        tag_ids = []
+        errors = {}
+        for index, tag in enumerate(tags):
+            try:
+                if isinstance(tag, bool):
+                    raise TypeError
+                tag_ids.append(int(tag))
+            except (TypeError, ValueError):
+                errors[index] = ['Некорректный идентификатор тега!']
+        existing = set(
+            Tag.objects.filter(id__in=tag_ids).values_list('id', flat=True)
+        )
+        seen = set()
+        for index, tag in enumerate(tags):
+            if index in errors:
+                continue
+            tag_id = int(tag)
+            if tag_id not in existing:
+                errors[index] = [f'Тег {tag_id} не найден!']
+            elif tag_id in seen:
+                errors[index] = ['Теги в рецепте должны быть уникальными!']
+            seen.add(tag_id)
+        if errors:
+            raise ValidationError({'tags': errors})
+        data['tags'] = tag_ids
         return data
 
     def validate_ingredients(self, data):
-        ingredients = self.initial_data.get('ingredients')
-        ingredients_set = set()
-        if not ingredients:
+        if not data:
             raise ValidationError('Нужно выбрать минимум 1 ингридиент!')
-        for ingredient in ingredients:
-            if int(ingredient['amount']) <= 0:
-                raise ValidationError('Количество должно быть положительным!')
-            id = ingredient.get('id')
-            if id in ingredients_set:
-                raise serializers.ValidationError(
-                    'Ингредиент в рецепте не должен повторяться!',
-                )
-            ingredients_set.add(id)
+        existing = set(Ingredient.objects.filter(
+            id__in=[item['ingredient']['id'] for item in data]
+        ).values_list('id', flat=True))
+        errors = []
+        seen = set()
+        for item in data:
+            ingredient_id = item['ingredient']['id']
+            item_errors = {}
+            if ingredient_id not in existing:
+                item_errors['id'] = [f'Ингредиент {ingredient_id} не найден!']
+            elif ingredient_id in seen:
+                item_errors['id'] = [
+                    'Ингредиент в рецепте не должен повторяться!'
+                ]
+            if item['amount'] <= 0:
+                item_errors['amount'] = [
+                    'Количество должно быть положительным!'
+                ]
+            seen.add(ingredient_id)
+            errors.append(item_errors)
+        if any(errors):
+            raise ValidationError(errors)
         return data
 
     def validate_cooking_time(self, value):
@@ -87,37 +142,87 @@ class RecipeSerializer(serializers.ModelSerializer):
         return value
 
     def create_recipe_ingredients(self, recipe, ingredients_data):
-        for ingredient in ingredients_data:
-            IngredientInRecipe.objects.create(
+        IngredientInRecipe.objects.bulk_create([
+            IngredientInRecipe(
                 recipe=recipe,
-                ingredient=ingredient['ingredient']['id'],
+                ingredient_id=ingredient['ingredient']['id'],
                 amount=ingredient['amount'],
-            )
+            ) for ingredient in ingredients_data
+        ])
+
+    def update_recipe_ingredients(self, recipe, ingredients_data):
+        current = {
+            item.ingredient_id: item for item in recipe.ingredients.all()
+        }
+        requested = {
+            ingredient['ingredient']['id']: ingredient
+            for ingredient in ingredients_data
+        }
+        to_create = []
+        to_update = []
+        for ingredient_id, ingredient in requested.items():
+            item = current.get(ingredient_id)
+            if item is None:
+                to_create.append(ingredient)
+            elif item.amount != ingredient['amount']:
+                item.amount = ingredient['amount']
+                to_update.append(item)
+        to_delete = current.keys() - requested.keys()
+        if to_delete:
+            IngredientInRecipe.objects.filter(
+                recipe=recipe, ingredient_id__in=to_delete
+            ).delete()
+        if to_update:
+            IngredientInRecipe.objects.bulk_update(to_update, ['amount'])
+        self.create_recipe_ingredients(recipe, to_create)
 
+    @transaction.atomic
     def create(self, validated_data):
         ingredients_data = validated_data.pop('ingredients')
-        tags_data = self.initial_data.get('tags')
-        recipe = Recipe.objects.create(**validated_data)
+        tags_data = validated_data.pop('tags')
+        recipe = Recipe.objects.create(
+            ingredients_count=len(ingredients_data), **validated_data
+        )
         recipe.tags.set(tags_data)
         self.create_recipe_ingredients(recipe, ingredients_data)
+        schedule_image_variants(recipe)
         return recipe
 
+    @transaction.atomic
     def update(self, instance, validated_data):
+        if 'image' in validated_data:
+            validated_data['image_variants'] = {}
+            schedule_image_variants(instance)
         ingredients_data = validated_data.pop('ingredients')
-        tags_data = self.initial_data.get('tags')
-        IngredientInRecipe.objects.filter(recipe=instance).delete()
-        self.create_recipe_ingredients(instance, ingredients_data)
+        tags_data = validated_data.pop('tags')
+        self.update_recipe_ingredients(instance, ingredients_data)
         instance.tags.set(tags_data)
+        instance.ingredients_count = len(ingredients_data)
+        instance = super().update(instance, validated_data)
+        return instance
 
-        return super().update(instance, validated_data)
+    def to_representation(self, instance):
+        if hasattr(instance, 'is_author_subscribed'):
+            instance.author.is_subscribed = instance.is_author_subscribed
+        data = super().to_representation(instance)
+        view = self.context.get('view')
+        if view is not None and view.action in ('list', 'feed'):
+            data['image'] = get_image_variant_url(
+                instance, self.context.get('request')
+            ) or data['image']
+        return data
 
     def get_is_favorited(self, obj):
+        if hasattr(obj, 'is_favorited'):
+            return obj.is_favorited
         user = self.context.get('request').user
         if user.is_anonymous:
             return False
         return Recipe.objects.filter(favorites__user=user, id=obj.id).exists()
 
     def get_is_in_shopping_cart(self, obj):
+        if hasattr(obj, 'is_in_shopping_cart'):
+            return obj.is_in_shopping_cart
         user = self.context.get('request').user
         if user.is_anonymous:
             return False
@@ -125,13 +230,30 @@ class RecipeSerializer(serializers.ModelSerializer):
 
 
 class CropRecipeSerializer(serializers.ModelSerializer):
-    image = Base64ImageField()
+    image = StreamingBase64ImageField()
 
     class Meta:
         model = Recipe
         fields = ('id', 'name', 'image', 'cooking_time')
         read_only_fields = ('id', 'name', 'image', 'cooking_time')
 
+    def to_representation(self, instance):
+        data = super().to_representation(instance)
+        data['image'] = get_image_variant_url(
+            instance, self.context.get('request')
+        ) or data['image']
+        return data
+
+
+class CookableRecipeSerializer(CropRecipeSerializer):
+    coverage = serializers.FloatField(read_only=True)
+    missing_count = serializers.IntegerField(read_only=True)
+
+    class Meta(CropRecipeSerializer.Meta):
+        fields = CropRecipeSerializer.Meta.fields + (
+            'coverage', 'missing_count'
+        )
+
 
 class FollowSerializer(serializers.ModelSerializer):
     id = serializers.ReadOnlyField(source='following.id')
@@ -149,17 +271,22 @@ class FollowSerializer(serializers.ModelSerializer):
                   'is_subscribed', 'recipes', 'recipes_count')
 
     def get_is_subscribed(self, obj):
-        return Follow.objects.filter(
-            user=obj.user, following=obj.following
-        ).exists()
+        return True
 
     def get_recipes(self, obj):
-        request = self.context.get('request')
-        limit = request.GET.get('recipes_limit')
-        queryset = Recipe.objects.filter(author=obj.following)
-        if limit:
-            queryset = queryset[:int(limit)]
+        if hasattr(obj.following, 'limited_recipes'):
+            queryset = obj.following.limited_recipes
+        else:
+            request = self.context.get('request')
+            limit = request.GET.get('recipes_limit')
+            queryset = Recipe.objects.filter(
+                author=obj.following
+            ).order_by('-id')
+            if limit:
+                queryset = queryset[:int(limit)]
         return CropRecipeSerializer(queryset, many=True).data
 
     def get_recipes_count(self, obj):
-        return Recipe.objects.filter(author=obj.following).count()
+        if hasattr(obj, 'recipes_count'):
+            return obj.recipes_count
+        return obj.following.recipes.count()
@@ -0,0 +1,167 @@
+from django.db.models import F
+from django.db.models.signals import (m2m_changed, post_delete, post_save,
+                                      pre_delete)
+from django.dispatch import receiver
+
+from users.models import Follow, User
+from .caching import bump_cache_version, bump_dependencies
+from .feed import fan_out_recipe, follow_author, unfollow_author
+from .ingredient_index import ingredient_index
+from .models import (FavouriteRecipe, Ingredient, IngredientInRecipe, Recipe,
+                     ShoppingCartRecipe, Tag)
+from .search import schedule_search_vector_update
+
+COUNTERS = {
+    Recipe: ('author_id', User, 'recipes_count'),
+    Follow: ('following_id', User, 'followers_count'),
+    FavouriteRecipe: ('recipe_id', Recipe, 'favorites_count'),
+    ShoppingCartRecipe: ('recipe_id', Recipe, 'cart_count'),
+    IngredientInRecipe: ('recipe_id', Recipe, 'ingredients_count'),
+}
+
+
+def change_counter(sender, instance, delta):
+    field, model, counter = COUNTERS[sender]
+    rows = model.objects.filter(pk=getattr(instance, field))
+    if delta < 0:
+        rows = rows.filter(**{f'{counter}__gte': -delta})
+    rows.update(**{counter: F(counter) + delta})
+
+
+@receiver(post_save, sender=Recipe)
+@receiver(post_save, sender=Follow)
+@receiver(post_save, sender=FavouriteRecipe)
+@receiver(post_save, sender=ShoppingCartRecipe)
+@receiver(post_save, sender=IngredientInRecipe)
+def increment_counter(sender, instance, created, **kwargs):
+    if created:
+        change_counter(sender, instance, 1)
+
+
+@receiver(post_delete, sender=Recipe)
+@receiver(post_delete, sender=Follow)
+@receiver(post_delete, sender=FavouriteRecipe)
+@receiver(post_delete, sender=ShoppingCartRecipe)
+@receiver(post_delete, sender=IngredientInRecipe)
+def decrement_counter(sender, instance, **kwargs):
+    change_counter(sender, instance, -1)
+
+
+@receiver((post_save, post_delete), sender=Ingredient)
+def invalidate_ingredient_index(sender, **kwargs):
+    ingredient_index.invalidate()
+
+
+@receiver((post_save, post_delete), sender=Ingredient)
+@receiver((post_save, post_delete), sender=Tag)
+def invalidate_reference_cache(sender, **kwargs):
+    bump_cache_version(sender)
+
+
+@receiver((post_save, post_delete), sender=Ingredient)
+def invalidate_anonymous_ingredients(sender, **kwargs):
+    bump_dependencies(['ingredients'])
+
+
+@receiver((post_save, post_delete), sender=Tag)
+def invalidate_anonymous_tag(sender, instance, **kwargs):
+    bump_dependencies([f'tag:{instance.id}', 'tags'])
+
+
+@receiver(post_save, sender=User)
+def invalidate_anonymous_author(sender, instance, update_fields, **kwargs):
+    if update_fields and set(update_fields) == {'last_login'}:
+        return
+    bump_dependencies([f'user:{instance.id}'])
+
+
+@receiver(post_save, sender=Recipe)
+def invalidate_anonymous_recipe(sender, instance, created, **kwargs):
+    if created:
+        bump_dependencies([
+            'recipes:list', f'recipes:list:author:{instance.author_id}'
+        ])
+    else:
+        bump_dependencies([f'recipe:{instance.id}'])
+
+
+@receiver(pre_delete, sender=Recipe)
+def remember_deleted_recipe_tags(sender, instance, **kwargs):
+    instance.deleted_tag_slugs = list(
+        instance.tags.values_list('slug', flat=True)
+    )
+
+
+@receiver(post_delete, sender=Recipe)
+def invalidate_anonymous_deleted_recipe(sender, instance, **kwargs):
+    bump_dependencies([
+        f'recipe:{instance.id}',
+        'recipes:list',
+        f'recipes:list:author:{instance.author_id}',
+    ] + [
+        f'recipes:list:tag:{slug}'
+        for slug in getattr(instance, 'deleted_tag_slugs', ())
+    ])
+
+
+@receiver((post_save, post_delete), sender=IngredientInRecipe)
+def invalidate_anonymous_recipe_ingredients(sender, instance, **kwargs):
+    bump_dependencies([f'recipe:{instance.recipe_id}'])
+
+
+@receiver(m2m_changed, sender=Recipe.tags.through)
+def invalidate_anonymous_recipe_tags(sender, instance, action, reverse,
+                                     pk_set, **kwargs):
+    if action not in ('post_add', 'post_remove', 'pre_clear'):
+        return
+    if reverse:
+        recipe_ids = pk_set or instance.recipes.values_list('id', flat=True)
+        bump_dependencies(
+            [f'recipes:list:tag:{instance.slug}']
+            + [f'recipe:{recipe_id}' for recipe_id in recipe_ids]
+        )
+        return
+    if action == 'pre_clear':
+        tags = instance.tags.all()
+    else:
+        tags = Tag.objects.filter(pk__in=pk_set)
+    bump_dependencies([f'recipe:{instance.id}'] + [
+        f'recipes:list:tag:{slug}'
+        for slug in tags.values_list('slug', flat=True)
+    ])
+
+
+@receiver(post_save, sender=Recipe)
+def refresh_recipe_search_vector(sender, instance, **kwargs):
+    schedule_search_vector_update([instance.pk])
+
+
+@receiver((post_save, post_delete), sender=IngredientInRecipe)
+def refresh_recipe_ingredients_search_vector(sender, instance, **kwargs):
+    schedule_search_vector_update([instance.recipe_id])
+
+
+@receiver(post_save, sender=Ingredient)
+def refresh_ingredient_search_vectors(sender, instance, created, **kwargs):
+    if created:
+        return
+    schedule_search_vector_update(IngredientInRecipe.objects.filter(
+        ingredient=instance
+    ).values_list('recipe_id', flat=True))
+
+
+@receiver(post_save, sender=Recipe)
+def add_recipe_to_feeds(sender, instance, created, **kwargs):
+    if created:
+        fan_out_recipe(instance)
+
+
+@receiver(post_save, sender=Follow)
+def add_author_to_feed(sender, instance, created, **kwargs):
+    if created:
+        follow_author(instance)
+
+
+@receiver(post_delete, sender=Follow)
+def remove_author_from_feed(sender, instance, **kwargs):
+    unfollow_author(instance)
@@ -0,0 +1,542 @@
+import base64
+import io
+import json
+import os
+import shutil
+import tempfile
+from unittest import mock
+
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured
+from django.core.management import call_command
+from django.db import connection
+from django.test import RequestFactory, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from PIL import Image
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.test import APIClient
+
+from users.models import Follow, User
+from .caching import WRITE_GENERATION, new_token
+from .models import (FavouriteRecipe, FeedRecipe, Ingredient,
+                     IngredientInRecipe, Recipe, ShoppingCartRecipe, Tag)
+from .representations import (build_fragments, represent_cached_recipes,
+                              user_flag_rows)
+from .serializers import RecipeSerializer
+from .views import RecipeViewSet
+
+MEDIA_ROOT = tempfile.mkdtemp()
+
+
+def tearDownModule():
+    shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
+
+
+def create_user(email):
+    return User.objects.create(
+        email=email, username=email.split('@')[0],
+        first_name='Имя', last_name='Фамилия',
+    )
+
+
+def create_tags(count):
+    return [
+        Tag.objects.create(name=f'тег {index}', color=f'#{index:06x}',
+                           slug=f'tag-{index}')
+        for index in range(count)
+    ]
+
+
+def create_ingredients(count):
+    return [
+        Ingredient.objects.create(name=f'ингредиент {index}',
+                                  measurement_unit='г')
+        for index in range(count)
+    ]
+
+
+def create_recipes(author, count, tags=(), ingredients=()):
+    recipes = []
+    for index in range(count):
+        recipe = Recipe.objects.create(
+            author=author, name=f'рецепт {index}', text='описание',
+            image='recipe_images/test.jpg', cooking_time=10,
+            ingredients_count=len(ingredients),
+        )
+        recipe.tags.set(tags)
+        IngredientInRecipe.objects.bulk_create(
+            IngredientInRecipe(recipe=recipe, ingredient=ingredient,
+                               amount=index + 1)
+            for ingredient in ingredients
+        )
+        recipes.append(recipe)
+    return recipes
+
+
+def encode_image():
+    buffer = io.BytesIO()
+    Image.new('RGB', (8, 8)).save(buffer, 'PNG')
+    return ('data:image/png;base64,'
+            + base64.b64encode(buffer.getvalue()).decode())
+
+
+class APITestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+
+
+class DownloadShoppingCartTests(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = create_user('cook@foodgram.local')
+        cls.ingredients = create_ingredients(20)
+
+    def fill_cart(self, size):
+        for recipe in create_recipes(self.user, size,
+                                     ingredients=self.ingredients):
+            ShoppingCartRecipe.objects.create(user=self.user, recipe=recipe)
+
+    def download(self):
+        self.client.force_authenticate(self.user)
+        with self.assertNumQueries(2):
+            response = self.client.get(
+                '/api/recipes/download_shopping_cart/'
+            )
+            content = b''.join(response.streaming_content)
+        self.assertEqual(response.status_code, 200)
+        with self.assertNumQueries(1):
+            cached = self.client.get(
+                '/api/recipes/download_shopping_cart/',
+                HTTP_IF_NONE_MATCH=response['ETag'],
+            )
+        self.assertEqual(cached.status_code, 304)
+        return content.decode()
+
+    def test_query_count_does_not_grow_with_cart(self):
+        self.fill_cart(1)
+        self.assertIn('ингредиент 0 - 1 г', self.download())
+        self.fill_cart(49)
+        self.assertIn('ингредиент 0 - 1226 г', self.download())
+
+    def test_etag_changes_with_cart_contents(self):
+        self.fill_cart(1)
+        self.client.force_authenticate(self.user)
+        url = '/api/recipes/download_shopping_cart/'
+        etag = self.client.get(url)['ETag']
+        self.fill_cart(1)
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_pdf_uses_configured_font(self):
+        self.fill_cart(1)
+        self.client.force_authenticate(self.user)
+        response = self.client.get(
+            '/api/recipes/download_shopping_cart/?format=pdf'
+        )
+        content = b''.join(response.streaming_content)
+        self.assertEqual(response['Content-Type'], 'application/pdf')
+        self.assertTrue(content.startswith(b'%PDF'))
+        self.assertIn(b'/FontFile2', content)
+
+    @override_settings(SHOPPING_LIST_PDF_FONT='/nonexistent/font.ttf')
+    def test_pdf_without_font_fails_loudly(self):
+        self.fill_cart(1)
+        self.client.force_authenticate(self.user)
+        with self.assertRaises(ImproperlyConfigured):
+            self.client.get(
+                '/api/recipes/download_shopping_cart/?format=pdf'
+            )
+
+
+@override_settings(RECIPE_FAST_READS=False)
+class RecipePrefetchPlanTests(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = create_user('reader@foodgram.local')
+        cls.author = create_user('author@foodgram.local')
+        cls.recipes = create_recipes(
+            cls.author, 6, tags=create_tags(3),
+            ingredients=create_ingredients(4),
+        )
+
+    def setUp(self):
+        super().setUp()
+        self.client.force_authenticate(self.user)
+
+    def test_list(self):
+        with self.assertNumQueries(5):
+            response = self.client.get('/api/recipes/')
+        self.assertEqual(len(response.data['results']), 6)
+        self.assertEqual(len(response.data['results'][0]['tags']), 3)
+        self.assertEqual(
+            len(response.data['results'][0]['ingredients']), 4
+        )
+
+    def test_retrieve(self):
+        with self.assertNumQueries(4):
+            response = self.client.get(f'/api/recipes/{self.recipes[0].id}/')
+        self.assertEqual(len(response.data['ingredients']), 4)
+
+    def test_favorite(self):
+        with self.assertNumQueries(4):
+            response = self.client.get(
+                f'/api/recipes/{self.recipes[0].id}/favorite/'
+            )
+        self.assertEqual(response.status_code, 201)
+
+    def test_shopping_cart(self):
+        with self.assertNumQueries(4):
+            response = self.client.get(
+                f'/api/recipes/{self.recipes[0].id}/shopping_cart/'
+            )
+        self.assertEqual(response.status_code, 201)
+
+
+class FlatReadPathTests(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = create_user('reader@foodgram.local')
+        cls.author = create_user('author@foodgram.local')
+        cls.recipes = create_recipes(
+            cls.author, 6, tags=create_tags(3),
+            ingredients=create_ingredients(4),
+        )
+        FavouriteRecipe.objects.create(user=cls.user, recipe=cls.recipes[0])
+        ShoppingCartRecipe.objects.create(
+            user=cls.user, recipe=cls.recipes[1]
+        )
+        Follow.objects.create(user=cls.user, following=cls.author)
+        Recipe.objects.filter(id=cls.recipes[2].id).update(image_variants={
+            'thumbnail': {'webp': 'recipe_images/test.thumbnail.webp'},
+        })
+
+    def get_view(self, user, action):
+        request = Request(RequestFactory().get('/api/recipes/'))
+        request.user = user
+        view = RecipeViewSet(
+            request=request, action=action, format_kwarg=None, kwargs={}
+        )
+        return view, request
+
+    def render_serializer(self, view, request):
+        return JSONRenderer().render(RecipeSerializer(
+            view.get_queryset(), many=True,
+            context={'request': request, 'view': view},
+        ).data)
+
+    def render_cached(self, view, request):
+        return JSONRenderer().render(represent_cached_recipes(
+            list(user_flag_rows(view.get_queryset())), request,
+            list_image=view.action == 'list',
+        ))
+
+    def test_output_is_identical_to_serializer(self):
+        for action in ('list', 'retrieve'):
+            cache.clear()
+            for state, user in (('cold', self.user),
+                                ('warm', AnonymousUser()),
+                                ('warm', self.user)):
+                with self.subTest(action=action, state=state, user=user):
+                    view, request = self.get_view(user, action)
+                    expected = self.render_serializer(view, request)
+                    queries = 1 if state == 'warm' else 4
+                    with self.assertNumQueries(queries):
+                        actual = self.render_cached(view, request)
+                    self.assertEqual(actual, expected)
+
+    def test_fragments_read_during_a_write_are_not_stored(self):
+        def build_during_write(rows):
+            cache.set(WRITE_GENERATION, new_token(), None)
+            return build_fragments(rows)
+
+        view, request = self.get_view(self.user, 'list')
+        rows = list(user_flag_rows(view.get_queryset()))
+        with mock.patch('recipes.representations.build_fragments',
+                        side_effect=build_during_write):
+            represent_cached_recipes(rows, request)
+        with self.assertNumQueries(3):
+            represent_cached_recipes(rows, request)
+        with self.assertNumQueries(0):
+            represent_cached_recipes(rows, request)
+
+
+class AnonymousResponseCacheTests(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        create_recipes(create_user('author@foodgram.local'), 2,
+                       tags=create_tags(1))
+
+    def get_query_count(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/api/recipes/')
+        self.assertEqual(response.status_code, 200)
+        return len(queries)
+
+    def test_page_is_served_from_cache(self):
+        self.get_query_count()
+        self.assertEqual(self.get_query_count(), 0)
+
+    def test_page_read_during_a_write_is_not_stored(self):
+        def render_during_write(*args, **kwargs):
+            cache.set(WRITE_GENERATION, new_token(), None)
+            return represent_cached_recipes(*args, **kwargs)
+
+        with mock.patch('recipes.views.represent_cached_recipes',
+                        side_effect=render_during_write):
+            self.get_query_count()
+        self.assertGreater(self.get_query_count(), 0)
+
+
+class SubscriptionsTests(APITestCase):
+    def test_recipes_count_is_counted_per_page(self):
+        user = create_user('reader@foodgram.local')
+        for index in range(3):
+            author = create_user(f'author{index}@foodgram.local')
+            create_recipes(author, index + 1)
+            Follow.objects.create(user=user, following=author)
+        User.objects.update(recipes_count=0)
+        self.client.force_authenticate(user)
+        with self.assertNumQueries(3):
+            response = self.client.get(
+                '/api/users/subscriptions/?recipes_limit=2'
+            )
+        self.assertEqual(
+            [(author['recipes_count'], len(author['recipes']))
+             for author in response.data['results']],
+            [(1, 1), (2, 2), (3, 2)],
+        )
+
+
+class CounterTests(TestCase):
+    def assertCounters(self, author, recipe, **counters):
+        author.refresh_from_db()
+        recipe.refresh_from_db()
+        self.assertEqual({
+            'recipes_count': author.recipes_count,
+            'followers_count': author.followers_count,
+            'favorites_count': recipe.favorites_count,
+            'cart_count': recipe.cart_count,
+            'ingredients_count': recipe.ingredients_count,
+        }, counters)
+
+    def test_orm_writes_maintain_counters(self):
+        author = create_user('author@foodgram.local')
+        reader = create_user('reader@foodgram.local')
+        recipes = create_recipes(author, 4)
+        recipe = recipes[0]
+        Follow.objects.create(user=reader, following=author)
+        FavouriteRecipe.objects.create(user=reader, recipe=recipe)
+        ShoppingCartRecipe.objects.create(user=reader, recipe=recipe)
+        for ingredient in create_ingredients(2):
+            IngredientInRecipe.objects.create(
+                recipe=recipe, ingredient=ingredient, amount=1
+            )
+        self.assertCounters(
+            author, recipe, recipes_count=4, followers_count=1,
+            favorites_count=1, cart_count=1, ingredients_count=2,
+        )
+        recipes[1].delete()
+        IngredientInRecipe.objects.filter(recipe=recipe).first().delete()
+        reader.delete()
+        self.assertCounters(
+            author, recipe, recipes_count=3, followers_count=0,
+            favorites_count=0, cart_count=0, ingredients_count=1,
+        )
+
+
+class CursorPaginationTests(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.recipes = create_recipes(create_user('author@foodgram.local'), 3)
+
+    def test_default_ordering_pages_by_id(self):
+        response = self.client.get('/api/recipes/?pagination=cursor&limit=2')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            [recipe['id'] for recipe in response.data['results']],
+            [self.recipes[2].id, self.recipes[1].id],
+        )
+        response = self.client.get(response.data['next'])
+        self.assertEqual(
+            [recipe['id'] for recipe in response.data['results']],
+            [self.recipes[0].id],
+        )
+
+    def test_custom_ordering_is_rejected(self):
+        response = self.client.get(
+            '/api/recipes/?pagination=cursor&ordering=popular'
+        )
+        self.assertEqual(response.status_code, 400)
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT)
+class RecipeWriteQueryTests(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = create_user('author@foodgram.local')
+        cls.tags = create_tags(2)
+        cls.ingredients = create_ingredients(10)
+
+    def setUp(self):
+        super().setUp()
+        self.client.force_authenticate(self.user)
+
+    def get_payload(self, ingredients, amount):
+        return {
+            'name': 'рецепт',
+            'text': 'описание',
+            'cooking_time': 10,
+            'image': encode_image(),
+            'tags': [tag.id for tag in self.tags],
+            'ingredients': [{'id': ingredient.id, 'amount': amount}
+                            for ingredient in ingredients],
+        }
+
+    def test_create(self):
+        with self.assertNumQueries(15):
+            response = self.client.post(
+                '/api/recipes/', self.get_payload(self.ingredients, 10),
+                format='json',
+            )
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(len(response.data['ingredients']), 10)
+
+    def test_update(self):
+        recipe = create_recipes(self.user, 1, tags=self.tags,
+                                ingredients=self.ingredients)[0]
+        with self.assertNumQueries(17):
+            response = self.client.put(
+                f'/api/recipes/{recipe.id}/',
+                self.get_payload(self.ingredients[:9], 20), format='json',
+            )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            [item['amount'] for item in response.data['ingredients']],
+            [20] * 9,
+        )
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT)
+class RecipeTagsValidationTests(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = create_user('author@foodgram.local')
+        cls.tags = create_tags(2)
+        cls.ingredient = create_ingredients(1)[0]
+
+    def setUp(self):
+        super().setUp()
+        self.client.force_authenticate(self.user)
+
+    def create_recipe(self, tags):
+        return self.client.post('/api/recipes/', {
+            'name': 'рецепт',
+            'text': 'описание',
+            'cooking_time': 10,
+            'image': encode_image(),
+            'tags': tags,
+            'ingredients': [{'id': self.ingredient.id, 'amount': 10}],
+        }, format='json')
+
+    def test_tags_must_be_a_list(self):
+        for tags in ('12', 5, {'id': self.tags[0].id}):
+            with self.subTest(tags=tags):
+                response = self.create_recipe(tags)
+                self.assertEqual(response.status_code, 400)
+                self.assertIn('tags', response.data)
+        self.assertFalse(Recipe.objects.exists())
+
+    def test_body_must_be_an_object(self):
+        for body in ([], 'x'):
+            with self.subTest(body=body):
+                response = self.client.post(
+                    '/api/recipes/', body, format='json'
+                )
+                self.assertEqual(response.status_code, 400)
+
+    def test_tag_ids_are_validated_per_item(self):
+        response = self.create_recipe([self.tags[0].id, True, 'x'])
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(set(response.data['tags']), {1, 2})
+
+    def test_list_of_tags_is_accepted(self):
+        response = self.create_recipe([tag.id for tag in self.tags])
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(
+            [tag['id'] for tag in response.data['tags']],
+            [tag.id for tag in self.tags],
+        )
+
+
+@override_settings(FEED_MAX_LENGTH=2, FEED_BATCH_SIZE=1)
+class FeedTrimTests(TestCase):
+    def get_feed(self, user):
+        return list(FeedRecipe.objects.filter(
+            user=user
+        ).order_by('-recipe_id').values_list('recipe_id', flat=True))
+
+    def test_fan_out_keeps_feeds_bounded(self):
+        author = create_user('author@foodgram.local')
+        followers = [create_user(f'reader{index}@foodgram.local')
+                     for index in range(3)]
+        for follower in followers:
+            Follow.objects.create(user=follower, following=author)
+        recipes = create_recipes(author, 4)
+        for follower in followers:
+            with self.subTest(follower=follower.email):
+                self.assertEqual(
+                    self.get_feed(follower), [recipes[3].id, recipes[2].id]
+                )
+
+    def test_fan_out_trims_feeds_over_several_rows(self):
+        author = create_user('author@foodgram.local')
+        follower = create_user('reader@foodgram.local')
+        Follow.objects.create(user=follower, following=author)
+        with self.settings(FEED_MAX_LENGTH=4):
+            recipes = create_recipes(author, 4)
+        recipes += create_recipes(author, 1)
+        self.assertEqual(
+            self.get_feed(follower), [recipes[4].id, recipes[3].id]
+        )
+
+
+class ImportRecipesTests(TestCase):
+    def setUp(self):
+        self.author = create_user('author@foodgram.local')
+        self.follower = create_user('reader@foodgram.local')
+        Follow.objects.create(user=self.follower, following=self.author)
+        self.path = os.path.join(MEDIA_ROOT, 'recipes.jsonl')
+        with open(self.path, 'w', encoding='utf-8') as output:
+            for index in range(3):
+                output.write(json.dumps({
+                    'author': self.author.email,
+                    'name': f'рецепт {index}',
+                    'text': 'описание',
+                    'image': 'recipe_images/test.jpg',
+                    'cooking_time': 10,
+                    'tags': [{'name': 'завтрак', 'color': '#ffffff',
+                              'slug': 'breakfast'}],
+                    'ingredients': [{'name': 'соль', 'measurement_unit': 'г',
+                                     'amount': index + 1}],
+                }, ensure_ascii=False) + '\n')
+
+    def import_recipes(self):
+        call_command('import_recipes', self.path, '--batch-size', '2',
+                     stdout=io.StringIO(), stderr=io.StringIO())
+
+    def test_import_is_idempotent_and_fills_derived_data(self):
+        self.import_recipes()
+        with open(f'{self.path}.progress', 'w') as state:
+            state.write('2')
+        self.import_recipes()
+        self.import_recipes()
+        self.assertEqual(Recipe.objects.count(), 3)
+        self.author.refresh_from_db()
+        self.assertEqual(self.author.recipes_count, 3)
+        self.assertEqual(
+            FeedRecipe.objects.filter(user=self.follower).count(), 3
+        )
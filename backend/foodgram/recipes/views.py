@@ -1,21 +1,36 @@
-from django.http import HttpResponse
+import hashlib
+
+from django.conf import settings
+from django.db.models import Exists, F, OuterRef, Prefetch, Sum
+from django.http import StreamingHttpResponse
 from django.shortcuts import get_object_or_404
+from django.utils.cache import get_conditional_response
+from django.utils.http import quote_etag
 
 from rest_framework import status, viewsets
 from rest_framework.decorators import action
-from rest_framework.permissions import IsAuthenticated
+from rest_framework.parsers import FormParser, JSONParser, MultiPartParser
+from rest_framework.permissions import AllowAny, IsAuthenticated
 from rest_framework.response import Response
 
+from users.models import Follow
+from .caching import (AnonymousResponseCacheMixin, CachedReferenceMixin,
+                      get_dependency_tokens)
+from .exporters import EXPORTERS, ExportContentNegotiation
 from .filters import RecipeFilter, IngredientNameFilter
-from .models import (FavouriteRecipe, Ingredient, IngredientInRecipe, Recipe,
-                     ShoppingCartRecipe, Tag)
+from .ingredient_index import ingredient_index
+from .matching import match_recipes
+from .models import (FavouriteRecipe, FeedRecipe, Ingredient,
+                     IngredientInRecipe, Recipe, ShoppingCartRecipe, Tag)
 from .pagination import CustomPaginator
 from .permissions import IsAdminOrReadOnly, IsOwnerOrReadOnly
-from .serializers import (CropRecipeSerializer, IngredientSerializer,
-                          RecipeSerializer, TagSerializer)
+from .representations import represent_cached_recipes, user_flag_rows
+from .serializers import (CookableRecipeSerializer, CropRecipeSerializer,
+                          IngredientSerializer, RecipeSerializer,
+                          TagSerializer)
 
 
-class IngredientViewSet(viewsets.ModelViewSet):
+class IngredientViewSet(CachedReferenceMixin, viewsets.ModelViewSet):
     permission_classes = (IsAdminOrReadOnly,)
     queryset = Ingredient.objects.all()
     serializer_class = IngredientSerializer
@@ -23,23 +38,95 @@ class IngredientViewSet(viewsets.ModelViewSet):
     filter_backends = (IngredientNameFilter,)
     search_fields = ('^name',)
 
+    def list(self, request, *args, **kwargs):
+        name = request.query_params.get(IngredientNameFilter.search_param)
+        if not name:
+            return super().list(request, *args, **kwargs)
+        return Response(ingredient_index.search(name))
+
 
-class TagViewSet(viewsets.ModelViewSet):
+class TagViewSet(CachedReferenceMixin, viewsets.ModelViewSet):
     permission_classes = (IsAdminOrReadOnly,)
     queryset = Tag.objects.all()
     serializer_class = TagSerializer
     pagination_class = None
 
 
-class RecipeViewSet(viewsets.ModelViewSet):
+class RecipeViewSet(AnonymousResponseCacheMixin, viewsets.ModelViewSet):
     permission_classes = [IsOwnerOrReadOnly]
     queryset = Recipe.objects.all()
     serializer_class = RecipeSerializer
     pagination_class = CustomPaginator
     filter_class = RecipeFilter
+    parser_classes = (JSONParser, MultiPartParser, FormParser)
+    cursor_keysets = ()
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if self.action in ('favorite', 'shopping_cart'):
+            return queryset.only(
+                'id', 'name', 'image', 'image_variants', 'cooking_time'
+            )
+        queryset = queryset.select_related('author').prefetch_related(
+            Prefetch('tags', queryset=Tag.objects.order_by('id')),
+            Prefetch(
+                'ingredients',
+                queryset=IngredientInRecipe.objects.select_related(
+                    'ingredient'
+                ).order_by('id'),
+            ),
+        )
+        user = self.request.user
+        if user.is_anonymous:
+            return queryset
+        return queryset.annotate(
+            is_favorited=Exists(FavouriteRecipe.objects.filter(
+                user=user, recipe=OuterRef('pk')
+            )),
+            is_in_shopping_cart=Exists(ShoppingCartRecipe.objects.filter(
+                user=user, recipe=OuterRef('pk')
+            )),
+            is_author_subscribed=Exists(Follow.objects.filter(
+                user=user, following=OuterRef('author')
+            )),
+        )
+
+    def list(self, request, *args, **kwargs):
+        cached = self.get_cached_response(request)
+        if cached is not None:
+            return cached
+        if not settings.RECIPE_FAST_READS:
+            return super().list(request, *args, **kwargs)
+        queryset = self.filter_queryset(self.get_queryset())
+        page = self.paginate_queryset(user_flag_rows(queryset))
+        return self.get_paginated_response(
+            represent_cached_recipes(page, request, list_image=True)
+        )
+
+    def retrieve(self, request, *args, **kwargs):
+        cached = self.get_cached_response(request)
+        if cached is not None:
+            return cached
+        if not settings.RECIPE_FAST_READS:
+            return super().retrieve(request, *args, **kwargs)
+        row = get_object_or_404(
+            user_flag_rows(self.filter_queryset(self.get_queryset())),
+            pk=kwargs['pk'],
+        )
+        return Response(represent_cached_recipes([row], request)[0])
 
     def perform_create(self, serializer):
         serializer.save(author=self.request.user)
+        self.reload_instance(serializer)
+
+    def perform_update(self, serializer):
+        serializer.save()
+        self.reload_instance(serializer)
+
+    def reload_instance(self, serializer):
+        serializer.instance = self.get_queryset().get(
+            pk=serializer.instance.pk
+        )
 
     @action(detail=True, methods=['get', 'delete'],
             permission_classes=[IsAuthenticated])
@@ -60,51 +147,104 @@ class RecipeViewSet(viewsets.ModelViewSet):
         return None
 
     @action(detail=False, methods=['get'],
-            permission_classes=[IsAuthenticated])
+            permission_classes=[IsAuthenticated],
+            content_negotiation_class=ExportContentNegotiation)
     def download_shopping_cart(self, request):
-        user = request.user
-        shopping_cart = user.cart.all()
-        list = {}
-        for item in shopping_cart:
-            recipe = item.recipe
-            ingredients = IngredientInRecipe.objects.filter(recipe=recipe)
-            for ingredient in ingredients:
-                amount = ingredient.amount
-                name = ingredient.ingredient.name
-                measurement_unit = ingredient.ingredient.measurement_unit
-                if name not in list:
-                    list[name] = {
-                        'measurement_unit': measurement_unit,
-                        'amount': amount
-                    }
-                else:
-                    list[name]['amount'] = (
-                            list[name]['amount'] + amount
-                    )
-
-        shopping_list = []
-        for item in list:
-            shopping_list.append(f'{item} - {list[item]["amount"]} '
-                                 f'{list[item]["measurement_unit"]} \n')
-        response = HttpResponse(shopping_list, 'Content-Type: text/plain')
-        response['Content-Disposition'] = 'attachment; filename="shoplist.txt"'
+        export_format = request.query_params.get('format', 'txt')
+        exporter_class = EXPORTERS.get(export_format)
+        if exporter_class is None:
+            return Response({
+                'errors': f'Неизвестный формат: {export_format}'
+            }, status=status.HTTP_400_BAD_REQUEST)
 
+        recipe_ids = sorted(ShoppingCartRecipe.objects.filter(
+            user=request.user
+        ).values_list('recipe_id', flat=True))
+        tokens = get_dependency_tokens(
+            ['ingredients'] + [f'recipe:{pk}' for pk in recipe_ids]
+        )
+        etag = quote_etag(hashlib.md5(repr(
+            (export_format, recipe_ids, sorted(tokens.items()))
+        ).encode()).hexdigest())
+        response = get_conditional_response(request, etag=etag)
+        if response is not None:
+            return response
+
+        ingredients = IngredientInRecipe.objects.filter(
+            recipe__cart__user=request.user
+        ).values(
+            name=F('ingredient__name'),
+            measurement_unit=F('ingredient__measurement_unit'),
+        ).annotate(
+            total_amount=Sum('amount')
+        ).order_by('name')
+        exporter = exporter_class()
+        response = StreamingHttpResponse(
+            exporter.render(ingredients.iterator()),
+            content_type=exporter.content_type,
+        )
+        response['Content-Disposition'] = (
+            f'attachment; filename="shoplist.{exporter.extension}"'
+        )
+        response['ETag'] = etag
+        response['Cache-Control'] = 'private, no-cache'
         return response
 
+    @action(detail=False, permission_classes=[IsAuthenticated],
+            cursor_keysets=(('-recipe_id',),))
+    def feed(self, request):
+        entries = FeedRecipe.objects.filter(
+            user=request.user
+        ).order_by('-recipe_id')
+        page = self.paginate_queryset(entries)
+        recipe_ids = [entry.recipe_id for entry in page]
+        if settings.RECIPE_FAST_READS:
+            rows = {
+                row['id']: row for row in user_flag_rows(
+                    self.get_queryset().filter(id__in=recipe_ids)
+                )
+            }
+            return self.get_paginated_response(represent_cached_recipes(
+                [rows[recipe_id] for recipe_id in recipe_ids
+                 if recipe_id in rows],
+                request,
+                list_image=True,
+            ))
+        recipes = self.get_queryset().in_bulk(recipe_ids)
+        serializer = self.get_serializer(
+            [recipes[entry.recipe_id] for entry in page
+             if entry.recipe_id in recipes],
+            many=True,
+        )
+        return self.get_paginated_response(serializer.data)
+
+    @action(detail=False, permission_classes=[AllowAny])
+    def cook(self, request):
+        ingredient_ids = [
+            value for value in request.query_params.getlist('ingredients')
+            if value.isdigit()
+        ]
+        if not ingredient_ids:
+            return Response({
+                'errors': 'Укажите хотя бы один ингредиент'
+            }, status=status.HTTP_400_BAD_REQUEST)
+        page = self.paginate_queryset(match_recipes(ingredient_ids))
+        serializer = CookableRecipeSerializer(page, many=True)
+        return self.get_paginated_response(serializer.data)
+
     def add_obj(self, model, user, pk):
         if model.objects.filter(user=user, recipe__id=pk).exists():
             return Response({
                 'errors': 'Рецепт уже добавлен в список'
             }, status=status.HTTP_400_BAD_REQUEST)
-        recipe = get_object_or_404(Recipe, id=pk)
+        recipe = get_object_or_404(self.get_queryset(), id=pk)
         model.objects.create(user=user, recipe=recipe)
         serializer = CropRecipeSerializer(recipe)
         return Response(serializer.data, status=status.HTTP_201_CREATED)
 
     def delete_obj(self, model, user, pk):
-        obj = model.objects.filter(user=user, recipe__id=pk)
-        if obj.exists():
-            obj.delete()
+        deleted, _ = model.objects.filter(user=user, recipe__id=pk).delete()
+        if deleted:
             return Response(status=status.HTTP_204_NO_CONTENT)
         return Response({
             'errors': 'Рецепт уже удален'
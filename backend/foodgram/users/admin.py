@@ -4,7 +4,8 @@ from .models import User
 
 
 class UserAdmin(admin.ModelAdmin):
-    list_display = ('username', 'email',)
+    list_display = ('username', 'email', 'recipes_count',
+                    'followers_count',)
     list_filter = ('email', 'username',)
 
 
@@ -23,6 +23,16 @@ class User(AbstractUser):
         default=Role.guest,
         verbose_name='статус пользователя',
     )
+    recipes_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name='количество рецептов',
+    )
+    followers_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name='количество подписчиков',
+    )
 
     class Meta:
         ordering = ['id']
@@ -56,5 +66,11 @@ class Follow(models.Model):
                 name='unique subscriptions'
             )
         ]
+        indexes = [
+            models.Index(
+                fields=['following', 'user'],
+                name='follow_following_user_idx',
+            )
+        ]
         verbose_name = 'Подписка'
         verbose_name_plural = 'Подписки'
@@ -1,3 +1,4 @@
+from django.db.models import Count, Exists, OuterRef, Prefetch, Subquery
 from django.shortcuts import get_object_or_404
 from djoser.views import UserViewSet
 from rest_framework import status
@@ -6,6 +7,7 @@ from rest_framework.generics import get_object_or_404
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 
+from recipes.models import Recipe
 from recipes.pagination import CustomPaginator
 from recipes.serializers import CustomUserSerializer, FollowSerializer
 from .models import Follow, User
@@ -16,6 +18,17 @@ class CustomUserViewSet(UserViewSet):
     serializer_class = CustomUserSerializer
     pagination_class = CustomPaginator
 
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        user = self.request.user
+        if user.is_anonymous:
+            return queryset
+        return queryset.annotate(
+            is_subscribed=Exists(Follow.objects.filter(
+                user=user, following=OuterRef('pk')
+            ))
+        )
+
     @action(detail=True, permission_classes=[IsAuthenticated])
     def subscribe(self, request, id=None):
         user = request.user
@@ -44,9 +57,10 @@ class CustomUserViewSet(UserViewSet):
             return Response({
                 'errors': 'Вы не можете отписываться от самого себя'
             }, status=status.HTTP_400_BAD_REQUEST)
-        follow = Follow.objects.filter(user=user, following=author)
-        if follow.exists():
-            follow.delete()
+        deleted, _ = Follow.objects.filter(
+            user=user, following=author
+        ).delete()
+        if deleted:
             return Response(status=status.HTTP_204_NO_CONTENT)
 
         return Response({
@@ -55,8 +69,21 @@ class CustomUserViewSet(UserViewSet):
 
     @action(detail=False, permission_classes=[IsAuthenticated])
     def subscriptions(self, request):
-        user = request.user
-        queryset = Follow.objects.filter(user=user)
+        recipes = Recipe.objects.order_by('-id')
+        limit = request.query_params.get('recipes_limit')
+        if limit and limit.isdigit():
+            recipes = recipes.filter(id__in=Subquery(
+                Recipe.objects.filter(
+                    author=OuterRef('author')
+                ).order_by('-id').values('id')[:int(limit)]
+            ))
+        queryset = Follow.objects.filter(
+            user=request.user
+        ).select_related('following').annotate(
+            recipes_count=Count('following__recipes')
+        ).prefetch_related(Prefetch(
+            'following__recipes', queryset=recipes, to_attr='limited_recipes'
+        ))
         pages = self.paginate_queryset(queryset)
         serializer = FollowSerializer(
             pages,